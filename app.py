@@ -1,36 +1,445 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import nltk
-from nltk.tokenize import sent_tokenize
+from nltk.tokenize import sent_tokenize as punkt_sent_tokenize
 import re
 import requests
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import atexit
 import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from embedding_store import EmbeddingStore
+from paper_cache import PaperCache, PaperSets
+from session_history import SessionHistory
+from local_corpus import LocalCorpus
+from sentence_cache import SentenceCache
+from scholar_client import SemanticScholarClient, SingleFlight
+from embedding_scheduler import EmbeddingScheduler
+from quantize import check_precision, dequantize, quantize, similarities
+from manuscript import ManuscriptStats, iter_batches, iter_paragraphs, preview
+from lexical_index import LexicalIndex
+from problem_index import ProblemIndex
+from revisions import RevisionTracker, Superseded
+import compression
+import segmenter
+import snapshot
+import logging_config
+import metrics
+
+logging_config.configure(os.environ.get("LOG_LEVEL", "INFO"), os.environ.get("LOG_FORMAT", "text"))
+log = logging.getLogger("research_companion")
 
 app = Flask(__name__)
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://localhost:5173", "http://127.0.0.1:5173"],
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
-model = SentenceTransformer("all-MiniLM-L6-v2")
-nltk.download("punkt", quiet=True)
+CORS_SETTINGS = {
+    "origins": ["http://localhost:5173", "http://127.0.0.1:5173"],
+    "methods": ["GET", "POST", "DELETE", "OPTIONS"],
+    "allow_headers": ["Content-Type", "Authorization", "X-Session-Id"]
+}
+CORS(app, resources={r"/*": CORS_SETTINGS})
+MODEL_NAME = "all-MiniLM-L6-v2"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Startup is split into phases: importing this module only sets up caches and
+# routes. The model loads on first use, in the background (MODEL_LOAD=background
+# or `python app.py`), or at import (MODEL_LOAD=eager, used for pre-fork preload).
+_model = None
+_model_lock = threading.Lock()
+_model_state = {"status": "not_loaded", "error": None, "load_seconds": None}
+_embedding_store = None
+_problem_index = None
+_store_lock = threading.Lock()
+
+def get_model():
+    """Return the SentenceTransformer, loading it on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model_state["status"] = "loading"
+                start = time.perf_counter()
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(MODEL_NAME)
+                except Exception as e:
+                    _model_state.update(status="failed", error=str(e))
+                    raise
+                _model_state.update(status="loaded", error=None,
+                                    load_seconds=round(time.perf_counter() - start, 3))
+                log.info("model loaded", extra={"model": MODEL_NAME, "seconds": _model_state["load_seconds"]})
+    return _model
+
+def warmup():
+    """Load the model and tokenizer and run one encode so the first request is fast."""
+    get_model()
+    embed_many([sent_tokenize("Warm up the model. Then serve requests.")[0]])
+    _model_state["warm"] = True
+
+def start_background_load():
+    """Load and warm the model in a daemon thread; returns immediately."""
+    def run():
+        try:
+            warmup()
+        except Exception as e:
+            log.error("model warmup failed", extra={"error": str(e)})
+    threading.Thread(target=run, name="model-warmup", daemon=True).start()
+
+def embedding_dim() -> int:
+    return get_model().get_sentence_embedding_dimension()
+
+# Sentences are split by segmenter.py (SEGMENTER=fast) or by NLTK punkt
+# (SEGMENTER=punkt). Punkt data is looked up offline: a vendored ./nltk_data
+# directory, NLTK_DATA, or the default NLTK paths. It is only downloaded when
+# NLTK_DOWNLOAD=1.
+SEGMENTER = os.environ.get("SEGMENTER", "fast").lower()
+nltk.data.path.insert(0, os.path.join(BASE_DIR, "nltk_data"))
+NLTK_DOWNLOAD = os.environ.get("NLTK_DOWNLOAD", "").lower() in ("1", "true", "yes")
+_punkt_available = None
+
+def _find_punkt() -> bool:
+    for resource in ("tokenizers/punkt_tab/english/", "tokenizers/punkt"):
+        try:
+            nltk.data.find(resource)
+            return True
+        except LookupError:
+            continue
+    return False
+
+def punkt_available() -> bool:
+    global _punkt_available
+    if _punkt_available is None:
+        _punkt_available = _find_punkt()
+        if not _punkt_available and NLTK_DOWNLOAD:
+            nltk.download("punkt", quiet=True)
+            nltk.download("punkt_tab", quiet=True)
+            _punkt_available = _find_punkt()
+        if not _punkt_available:
+            log.warning("NLTK punkt data not found; using the regex sentence splitter")
+    return _punkt_available
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+def sent_tokenize(text):
+    """Split text into sentences (see sentence_segments)."""
+    return [sentence for sentence, _, _ in sentence_segments(text)]
+
+# Segmentations are memoized per text, bounded by the total characters cached;
+# longer texts (whole documents) are segmented each time.
+SEGMENT_CACHE = segmenter.SegmentCache(
+    max_chars=int(os.environ.get("SEGMENT_CACHE_CHARS", "2000000")),
+    max_text_chars=int(os.environ.get("SEGMENT_CACHE_MAX_TEXT", "20000")),
+)
+
+def sentence_segments(text: str) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    ``(sentence, start, end)`` for each sentence of ``text``, with character offsets into it.
+    
+    Memoized in SEGMENT_CACHE, so the scoring, sentence analysis and change
+    detection of one request (and the next live request) share one
+    segmentation pass. With SEGMENTER=punkt, sentences come from punkt (or a
+    simple regex split when punkt data is missing) and are located in order.
+    """
+    return SEGMENT_CACHE.get(text, _segment)
+
+def _segment(text: str) -> Tuple[Tuple[str, int, int], ...]:
+    """sentence_segments without the cache."""
+    with metrics.stage("tokenize"):
+        if SEGMENTER != "punkt":
+            return tuple((text[start:end], start, end) for start, end in segmenter.spans(text))
+        if punkt_available():
+            sentences = punkt_sent_tokenize(text)
+        else:
+            sentences = [s.strip() for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+        segments, position = [], 0
+        for sentence in sentences:
+            start = text.find(sentence, position)
+            start = position if start < 0 else start
+            position = start + len(sentence)
+            segments.append((sentence, start, position))
+        return tuple(segments)
+
+def get_embedding_store() -> EmbeddingStore:
+    """The on-disk paper embedding store, opened once the model dimension is known."""
+    global _embedding_store
+    if _embedding_store is None:
+        dim = embedding_dim()
+        with _store_lock:
+            if _embedding_store is None:
+                _embedding_store = EmbeddingStore(
+                    os.path.join(CACHE_DIR, "embeddings"),
+                    dim=dim,
+                    model_name=MODEL_NAME,
+                    capacity=int(os.environ.get("EMBEDDING_STORE_CAPACITY", "50000")),
+                    precision=EMBEDDING_PRECISION,
+                )
+    return _embedding_store
+
+def get_problem_index() -> ProblemIndex:
+    """Embeddings of problems with cached papers, opened once the model dimension is known."""
+    global _problem_index
+    if _problem_index is None:
+        dim = embedding_dim()
+        with _store_lock:
+            if _problem_index is None:
+                index = ProblemIndex(
+                    os.path.join(CACHE_DIR, "papers.sqlite"),
+                    dim=dim,
+                    model_name=MODEL_NAME,
+                    threshold=SEMANTIC_CACHE_THRESHOLD,
+                    max_entries=int(os.environ.get("PAPER_CACHE_MAX_ENTRIES", "1000")),
+                )
+                if SNAPSHOT is not None and SNAPSHOT.model == MODEL_NAME and SNAPSHOT.dim == dim:
+                    index.add_many((entry["key"], entry["problem"], SNAPSHOT.vector(entry)) for entry in SNAPSHOT
+                                   if entry["problem"] and entry["vector_row"] is not None and entry["key"] not in index)
+                _problem_index = index
+    return _problem_index
+
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+os.makedirs(CACHE_DIR, exist_ok=True)
+# Precision of stored embeddings (paper store, sentence cache, session history
+# and vectors attached to cached papers): float32, float16 or int8.
+EMBEDDING_PRECISION = check_precision(os.environ.get("EMBEDDING_PRECISION", "float32"))
+PAPER_CACHE = PaperCache(
+    os.path.join(CACHE_DIR, "papers.sqlite"),
+    max_entries=int(os.environ.get("PAPER_CACHE_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.environ.get("PAPER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.environ.get("PAPER_CACHE_TTL", str(24 * 3600))),
+    stale_ttl=float(os.environ.get("PAPER_CACHE_STALE_TTL", str(7 * 24 * 3600))),
+    negative_ttl=float(os.environ.get("PAPER_CACHE_NEGATIVE_TTL", "300")),
+    flush_interval=float(os.environ.get("PAPER_CACHE_FLUSH_INTERVAL", "60")),
+)
+atexit.register(PAPER_CACHE.flush)
+SENTENCE_CACHE = SentenceCache(
+    max_sentences=int(os.environ.get("SENTENCE_CACHE_MAX_ITEMS", "20000")),
+    max_sessions=int(os.environ.get("SESSION_HISTORY_MAX_SESSIONS", "1000")),
+    precision=EMBEDDING_PRECISION,
+)
+PARAGRAPH_HISTORY = SessionHistory(
+    max_items=int(os.environ.get("SESSION_HISTORY_MAX_ITEMS", "200")),
+    max_sessions=int(os.environ.get("SESSION_HISTORY_MAX_SESSIONS", "1000")),
+    precision=EMBEDDING_PRECISION,
+)
 
-PARAGRAPH_HISTORY = []
-PAPER_CACHE = {}
+# Live-editor requests carry a revision; work for a revision that a newer one
+# of the same session has overtaken is dropped between stages.
+SUPERSEDED = metrics.counter("superseded_analyses_total",
+                             "Editor analyses dropped because a newer revision arrived, by stage")
+REVISIONS = RevisionTracker(
+    max_sessions=int(os.environ.get("SESSION_HISTORY_MAX_SESSIONS", "1000")),
+    on_superseded=lambda stage: SUPERSEDED.inc(stage=stage),
+)
+
+LOCAL_CORPUS = None
+if os.environ.get("LOCAL_CORPUS_DIR"):
+    LOCAL_CORPUS = LocalCorpus(
+        os.environ["LOCAL_CORPUS_DIR"],
+        nprobe=int(os.environ.get("LOCAL_CORPUS_NPROBE", "8")),
+    )
+    if LOCAL_CORPUS.model_name != MODEL_NAME:
+        raise RuntimeError(f"Local corpus was built with {LOCAL_CORPUS.model_name}, server uses {MODEL_NAME}")
+# Hybrid retrieval over every paper fetched so far: "rerank" merges BM25 hits
+# into the fetched papers and re-ranks them, "local" also skips the API call
+# when enough local papers match, "off" disables the index.
+LEXICAL_MODE = os.environ.get("LEXICAL_MODE", "rerank").lower()
+LEXICAL_INDEX = None
+if LEXICAL_MODE != "off":
+    LEXICAL_INDEX = LexicalIndex(max_documents=int(os.environ.get("LEXICAL_INDEX_MAX_PAPERS", "50000")))
+LEXICAL_CANDIDATES = int(os.environ.get("LEXICAL_CANDIDATES", "30"))
+LEXICAL_WEIGHT = float(os.environ.get("LEXICAL_WEIGHT", "0.3"))
+LEXICAL_MIN_SIMILARITY = float(os.environ.get("LEXICAL_MIN_SIMILARITY", "0.5"))
+# Shared with the async client of async_app.py.
+SCHOLAR_SETTINGS = dict(
+    base_url=os.environ.get("SEMANTIC_SCHOLAR_URL", "https://api.semanticscholar.org/graph/v1"),
+    api_key=os.environ.get("SEMANTIC_SCHOLAR_API_KEY"),
+    max_retries=int(os.environ.get("SCHOLAR_MAX_RETRIES", "3")),
+    rate=float(os.environ.get("SCHOLAR_RATE", "1.0")),
+    burst=int(os.environ.get("SCHOLAR_BURST", "3")),
+    pool_size=int(os.environ.get("SCHOLAR_POOL_SIZE", "10")),
+)
+SCHOLAR_CLIENT = SemanticScholarClient(**SCHOLAR_SETTINGS)
+PAPER_FLIGHTS = SingleFlight()
+# A problem without an exact paper-cache entry reuses the papers of a cached
+# problem whose embedding is at least SEMANTIC_CACHE_THRESHOLD similar.
+SEMANTIC_CACHE = os.environ.get("SEMANTIC_CACHE", "1").lower() not in ("0", "false", "no")
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+REMOTE_PAPERS = os.environ.get("REMOTE_PAPERS", "1").lower() not in ("0", "false", "no")
+NOVELTY_NEIGHBOURS = int(os.environ.get("NOVELTY_NEIGHBOURS", "20"))
 
 def clean(text):
     return re.sub(r"<[^>]+>", "", text or "").strip()
 
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+
+EMBED_BATCH_TEXTS = metrics.histogram("embed_batch_size", "Texts per model encode call", metrics.SIZE_BUCKETS)
+EMBED_SECONDS = metrics.histogram("embed_batch_seconds", "Duration of model encode calls")
+
+def encode_batch(texts: List[str]) -> np.ndarray:
+    start = time.perf_counter()
+    vectors = np.asarray(get_model().encode(texts, normalize_embeddings=True, batch_size=EMBED_BATCH_SIZE), dtype=np.float32)
+    EMBED_BATCH_TEXTS.observe(len(texts))
+    EMBED_SECONDS.observe(time.perf_counter() - start)
+    return vectors
+
+EMBED_SCHEDULER = None
+if os.environ.get("EMBED_BATCHING", "1").lower() not in ("0", "false", "no"):
+    EMBED_SCHEDULER = EmbeddingScheduler(
+        encode_batch,
+        max_batch_size=EMBED_BATCH_SIZE,
+        max_wait_ms=float(os.environ.get("EMBED_BATCH_WAIT_MS", "5")),
+    )
+
 def embed(text):
-    return model.encode(text, normalize_embeddings=True)
+    return embed_many([text])[0]
+
+def embed_many(texts: List[str]) -> np.ndarray:
+    """
+    Encode several texts (one row per text).
+    
+    Texts go through EMBED_SCHEDULER, which merges them with texts from other
+    in-flight requests into shared model batches.
+    """
+    if not texts:
+        return np.zeros((0, embedding_dim()), dtype=np.float32)
+    with metrics.stage("embed"):
+        if EMBED_SCHEDULER is None:
+            return encode_batch(list(texts))
+        return EMBED_SCHEDULER.encode(list(texts))
 
-def cosine(a, b):
-    return float(np.dot(a, b))
+CACHE_LOOKUPS = metrics.counter("cache_lookups_total", "Cache lookups by cache and result")
+
+def embed_cached(texts: List[str], uncached: List[str] = ()) -> np.ndarray:
+    """
+    Embed ``uncached`` followed by ``texts`` with at most one model call.
+    
+    Rows for ``texts`` (sentences, problem statements) are served from
+    SENTENCE_CACHE when possible; only cache misses and ``uncached`` are encoded.
+    """
+    uncached = list(uncached)
+    vectors = SENTENCE_CACHE.get_embeddings(texts)
+    todo = [i for i, v in enumerate(vectors) if v is None]
+    CACHE_LOOKUPS.inc(len(texts) - len(todo), cache="sentence", result="hit")
+    CACHE_LOOKUPS.inc(len(todo), cache="sentence", result="miss")
+    fresh = embed_many(uncached + [texts[i] for i in todo])
+    if todo:
+        SENTENCE_CACHE.put_embeddings([texts[i] for i in todo], fresh[len(uncached):])
+        for i, vec in zip(todo, fresh[len(uncached):]):
+            vectors[i] = vec
+    rows = list(fresh[:len(uncached)]) + vectors
+    if not rows:
+        return np.zeros((0, embedding_dim()), dtype=np.float32)
+    return np.stack(rows)
+
+# Papers are embedded as several chunks (windows of whole sentences) rather
+# than one vector of their first 1000 characters. PAPER_CHUNK_CHARS=0 restores
+# the single truncated vector.
+PAPER_CHUNK_CHARS = int(os.environ.get("PAPER_CHUNK_CHARS", "600"))
+PAPER_MAX_CHUNKS = int(os.environ.get("PAPER_MAX_CHUNKS", "8"))
+
+def paper_chunks(paper: Dict) -> List[str]:
+    """Split a paper's text into sentence windows of at most PAPER_CHUNK_CHARS characters."""
+    text = paper.get("text", "")
+    if PAPER_CHUNK_CHARS <= 0:
+        return [text[:1000]]
+    chunks, current = [], ""
+    for sentence in sent_tokenize(text):
+        sentence = sentence[:PAPER_CHUNK_CHARS]
+        if current and len(current) + 1 + len(sentence) > PAPER_CHUNK_CHARS:
+            chunks.append(current)
+            if len(chunks) == PAPER_MAX_CHUNKS:
+                return chunks
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current or not chunks:
+        chunks.append(current or text[:PAPER_CHUNK_CHARS])
+    return chunks
+
+def paper_embeddings(papers: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the chunk vectors of ``papers`` packed as ``(codes, scales, offsets)``.
+    
+    ``codes`` holds every paper's chunk rows one after another (in the storage
+    precision, see quantize.py), ``scales`` their per-row scales and
+    ``offsets[i]`` the first row of paper ``i``. Chunk vectors already
+    attached to a paper are reused, the rest are looked up in the embedding
+    store, and only chunks the store has never seen are encoded (in one batch).
+    Each paper keeps its rows as ``paper["embedding"]`` and
+    ``paper["embedding_scale"]``.
+    """
+    missing = [p for p in papers if p.get("embedding") is None]
+    if missing:
+        chunk_lists = [paper_chunks(p) for p in missing]
+        texts = [chunk for chunks in chunk_lists for chunk in chunks]
+        hits = get_embedding_store().get_codes(texts)
+        todo = [i for i, hit in enumerate(hits) if hit is None]
+        CACHE_LOOKUPS.inc(len(texts) - len(todo), cache="embedding_store", result="hit")
+        CACHE_LOOKUPS.inc(len(todo), cache="embedding_store", result="miss")
+        if todo:
+            fresh = embed_many([texts[i] for i in todo])
+            get_embedding_store().put_many([texts[i] for i in todo], fresh)
+            codes, scales = quantize(fresh, EMBEDDING_PRECISION)
+            for i, code, scale in zip(todo, codes, scales):
+                hits[i] = (code, scale)
+        start = 0
+        for paper, chunks in zip(missing, chunk_lists):
+            rows = hits[start:start + len(chunks)]
+            start += len(chunks)
+            # Scale first: another thread treats a set "embedding" as complete.
+            paper["embedding_scale"] = np.concatenate([np.reshape(scale, -1) for _, scale in rows]).astype(np.float32)
+            paper["embedding"] = np.stack([code for code, _ in rows])
+    if not papers:
+        return np.zeros((0, embedding_dim()), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    
+    # Vectors attached elsewhere (e.g. the local corpus) may be a single unscaled row.
+    rows = [np.atleast_2d(p["embedding"]) for p in papers]
+    scales = [np.broadcast_to(np.reshape(np.asarray(p.get("embedding_scale", 1.0), dtype=np.float32), -1), len(r))
+              for p, r in zip(papers, rows)]
+    offsets = np.zeros(len(papers), dtype=np.int64)
+    np.cumsum([len(r) for r in rows[:-1]], out=offsets[1:])
+    return np.concatenate(rows), np.concatenate(scales), offsets
+
+def paper_similarities(codes: np.ndarray, scales: np.ndarray, offsets: np.ndarray,
+                       vector: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Similarity of ``vector`` to each packed paper: the max over its chunks.
+    
+    One matrix-vector product over all chunk rows, then a segmented max.
+    Returns ``(similarities, best_chunk)`` with one entry per paper.
+    """
+    if not len(offsets):
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    sims = similarities(codes, scales, vector)
+    best = np.maximum.reduceat(sims, offsets)
+    ends = np.append(offsets[1:], len(sims))
+    best_chunk = np.array([int(np.argmax(sims[a:b])) for a, b in zip(offsets, ends)], dtype=np.int64)
+    return best, best_chunk
+
+def paper_passage(paper: Dict, chunk: int) -> str:
+    """Preview of the chunk of ``paper`` that matched best."""
+    chunks = paper_chunks(paper)
+    return preview(chunks[min(chunk, len(chunks) - 1)], 200)
+
+def cosine(a, b, scale=1.0):
+    """Cosine of unit vectors; ``a`` may be quantized codes with their ``scale``."""
+    return float(np.dot(a, b) * scale)
+
+def get_session_id(data: Dict, req=None) -> str:
+    """Session/client id from the request body or X-Session-Id header, else the client address."""
+    req = req or request
+    return str(data.get("session_id") or req.headers.get("X-Session-Id") or req.remote_addr or "anonymous")
+
+def get_revision(data: Dict) -> Optional[int]:
+    """The editor's revision number for this request, or None when it sent none (or garbage)."""
+    try:
+        return int(data["revision"])
+    except (KeyError, TypeError, ValueError):
+        return None
 
 def get_problem_hash(problem: str) -> str:
     """Generate a hash for the problem statement to use as cache key."""
@@ -55,86 +464,349 @@ def extract_key_terms(problem: str, max_terms: int = 5) -> str:
         return " ".join(result)
     return " ".join(key_terms[:max_terms]) if key_terms else problem[:100]
 
+def find_papers(problem: str, limit: int = 10) -> List[Dict]:
+    """
+    Papers for a problem from the local corpus, the lexical index and/or Semantic Scholar.
+    
+    With LOCAL_CORPUS configured, the nearest corpus papers to the problem come
+    first and Semantic Scholar results are appended unless REMOTE_PAPERS is off.
+    With the lexical index enabled, BM25 matches among previously fetched
+    papers join the candidates and the best ``limit`` are kept by
+    rerank_papers; in LEXICAL_MODE=local the API is not called when enough
+    of those local candidates are close to the problem.
+    """
+    local, answer = local_papers(problem, limit)
+    if answer is not None:
+        return answer
+    return combine_papers(problem, local, fetch_research_papers(problem, limit), limit)
+
+def local_papers(problem: str, limit: int = 10) -> Tuple[List[Dict], Optional[List[Dict]]]:
+    """
+    The part of find_papers that needs no API call.
+    
+    Returns ``(candidates, answer)``: the local corpus and lexical candidates,
+    and the final paper list when those suffice (None when Semantic Scholar
+    has to be asked, see combine_papers).
+    """
+    papers = []
+    if LOCAL_CORPUS is not None:
+        papers = LOCAL_CORPUS.search_papers(embed_many([problem])[0], limit)
+    if LEXICAL_INDEX is None:
+        if LOCAL_CORPUS is not None and not REMOTE_PAPERS:
+            return papers, papers
+        return papers, None
+    
+    with metrics.stage("lexical"):
+        local = merge_papers(papers, [paper for paper, _ in LEXICAL_INDEX.search(problem, LEXICAL_CANDIDATES)])
+    if LEXICAL_MODE == "local" and len(local) >= limit:
+        ranked, similarity = rerank_papers(problem, local, limit)
+        if min(similarity) >= LEXICAL_MIN_SIMILARITY:
+            LEXICAL_ANSWERS.inc(source="local")
+            return local, ranked
+    if not REMOTE_PAPERS:
+        LEXICAL_ANSWERS.inc(source="local")
+        return local, rerank_papers(problem, local, limit)[0]
+    LEXICAL_ANSWERS.inc(source="remote")
+    return local, None
+
+def combine_papers(problem: str, local: List[Dict], remote: List[Dict], limit: int = 10) -> List[Dict]:
+    """
+    Merge Semantic Scholar results with the local candidates of local_papers.
+    
+    ``remote`` may be a near-duplicate problem's papers (a semantic cache
+    hit), so they are always re-ranked for ``problem``: by the hybrid score
+    with the lexical index, else by cosine alone.
+    """
+    if LEXICAL_INDEX is None:
+        remote = rerank_papers(problem, remote, len(remote))[0]
+        return merge_papers(local, remote) if LOCAL_CORPUS is not None else remote
+    return rerank_papers(problem, merge_papers(remote, local), limit)[0]
+
+LEXICAL_ANSWERS = metrics.counter("paper_lookups_total", "Paper lookups answered locally or with an API call")
+
+def rerank_papers(problem: str, papers: List[Dict], limit: int) -> Tuple[List[Dict], List[float]]:
+    """
+    Keep the ``limit`` papers with the best hybrid score for ``problem``.
+    
+    The hybrid score is ``(1 - LEXICAL_WEIGHT) * cosine + LEXICAL_WEIGHT * bm25``
+    with BM25 divided by the best candidate's; without the lexical index
+    (LEXICAL_MODE=off) it is the cosine alone. Returns the papers, best
+    first, and their cosine similarities to the problem.
+    """
+    if not papers:
+        return [], []
+    with metrics.stage("rerank"):
+        cosines, _ = paper_similarities(*paper_embeddings(papers), embed_cached([problem])[0])
+        if LEXICAL_INDEX is None:
+            hybrid = cosines
+        else:
+            bm25 = LEXICAL_INDEX.scores(problem)
+            lexical = np.array([bm25.get(paper_id(paper), 0.0) for paper in papers], dtype=np.float32)
+            if lexical.max() > 0:
+                lexical /= lexical.max()
+            hybrid = (1 - LEXICAL_WEIGHT) * cosines + LEXICAL_WEIGHT * lexical
+        order = np.argsort(-hybrid, kind="stable")[:limit]
+    return [papers[i] for i in order], [float(cosines[i]) for i in order]
+
+def merge_papers(papers: List[Dict], extra: List[Dict]) -> List[Dict]:
+    """Append papers from ``extra`` whose titles are not already in ``papers``."""
+    seen = {p["title"].lower() for p in papers}
+    merged = list(papers)
+    for paper in extra:
+        if paper["title"].lower() not in seen:
+            seen.add(paper["title"].lower())
+            merged.append(paper)
+    return merged
+
+def paper_id(paper: Dict) -> str:
+    """Stable content-derived id for a paper."""
+    return hashlib.sha1((paper.get("text") or paper.get("title", "")).encode("utf-8")).hexdigest()[:16]
+
+def load_snapshot(path: str) -> snapshot.Snapshot:
+    """
+    Seed the paper cache from a snapshot file written by snapshot.py.
+    
+    Snapshot entries past the stale window are skipped; the rest keep the
+    expiry they were exported with, so an old snapshot is served stale and
+    refreshed. Problems already cached (e.g. persisted from an earlier boot)
+    keep their entry and only borrow vectors for matching papers. Papers keep
+    memory-mapped views of their chunk rows, converted only when the
+    snapshot was written in another precision. A snapshot from another model
+    contributes its papers without vectors. Problem vectors are added to the
+    problem index when it is opened (see get_problem_index).
+    """
+    snap = snapshot.Snapshot(path)
+    vectors = snap.model == MODEL_NAME
+    if not vectors:
+        log.warning("snapshot embeddings ignored", extra={"path": path, "model": snap.model})
+    now = time.time()
+    loaded = 0
+    for entry in snap:
+        if entry["expires_at"] + PAPER_CACHE.stale_ttl <= now:
+            continue
+        papers = snap.papers(entry)
+        for paper in papers:
+            if not vectors:
+                del paper["embedding"], paper["embedding_scale"]
+            elif snap.precision != EMBEDDING_PRECISION:
+                codes, scales = quantize(dequantize(paper["embedding"], paper["embedding_scale"]), EMBEDDING_PRECISION)
+                paper["embedding_scale"], paper["embedding"] = scales, codes
+        cached, _ = PAPER_CACHE.lookup(entry["key"])
+        if cached is None:
+            PAPER_CACHE.set(entry["key"], papers, ttl=entry["expires_at"] - now)
+            loaded += 1
+        elif vectors:
+            by_id = {paper_id(paper): paper for paper in papers}
+            for paper in cached:
+                match = by_id.get(paper_id(paper))
+                if paper.get("embedding") is None and match is not None:
+                    paper["embedding_scale"] = match["embedding_scale"]
+                    paper["embedding"] = match["embedding"]
+            PAPER_CACHE.account(entry["key"])
+    log.info("snapshot loaded", extra={"path": path, "problems": loaded, "skipped": len(snap) - loaded})
+    return snap
+
+def export_snapshot(path: str, problems: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Write the paper cache, with paper and problem embeddings, to a snapshot file.
+    
+    Args:
+        path: Output file
+        problems: Problem text by paper-cache key; only these entries are
+            written. By default every cached entry is, with its problem text
+            from the problem index where known (the index also wins for keys
+            reached through a semantic hit).
+    
+    Returns:
+        The snapshot header (see snapshot.py)
+    """
+    index = get_problem_index() if SEMANTIC_CACHE or problems is not None else None
+    entries = []
+    for key, papers, expires_at in PAPER_CACHE.iter_entries():
+        if problems is not None and key not in problems:
+            continue
+        problem = (index.problem(key) if index is not None else None) or (problems or {}).get(key)
+        vector = index.vector(key) if index is not None else None
+        if vector is None and problem:
+            vector = embed_cached([problem])[0]
+        paper_embeddings(papers)
+        entries.append({"key": key, "problem": problem, "expires_at": expires_at, "papers": papers, "vector": vector})
+    return snapshot.write(path, entries, MODEL_NAME, embedding_dim(), EMBEDDING_PRECISION)
+
+# A snapshot (snapshot.py) warms a fresh replica without Semantic Scholar calls or re-embedding.
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+SNAPSHOT = load_snapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+
+if LEXICAL_INDEX is not None:
+    LEXICAL_INDEX.add_many((paper_id(paper), paper) for paper in PAPER_CACHE.iter_papers())
+
+def paper_metadata(paper: Dict) -> Dict:
+    """The client-facing fields of a paper."""
+    return {
+        "id": paper_id(paper),
+        "title": paper.get("title", ""),
+        "abstract": paper.get("abstract", ""),
+        "authors": paper.get("authors", []),
+        "year": paper.get("year"),
+        "citations": paper.get("citations", 0)
+    }
+
+# Paper lists sent to clients, so /score can send ids once a client holds the list.
+PAPER_SETS = PaperSets(int(os.environ.get("PAPER_SETS_MAX", "1000")))
+
+def register_paper_set(papers: List[Dict]) -> Tuple[str, List[Dict]]:
+    """
+    Content id and client-facing metadata of a paper list, remembered for GET /papers/<id>.
+    
+    The id hashes the ordered paper ids, so the same papers in the same order
+    always get the same id (and ETag) -- across requests, sessions and processes.
+    """
+    metadata = [paper_metadata(paper) for paper in papers]
+    set_id = hashlib.sha1(",".join(p["id"] for p in metadata).encode("utf-8")).hexdigest()[:16]
+    PAPER_SETS.put(set_id, metadata)
+    return set_id, metadata
+
 def fetch_research_papers(problem: str, limit: int = 10) -> List[Dict]:
     """
     Fetch research papers from Semantic Scholar API based on problem statement.
     Returns a list of papers with title, abstract, and authors.
-    """
-    problem_hash = get_problem_hash(problem)
     
-    if problem_hash in PAPER_CACHE:
-        print(f"📚 Using cached papers for problem: {problem[:50]}...")
-        return PAPER_CACHE[problem_hash]
-    
-    print(f"🔍 Fetching research papers for: {problem[:50]}...")
+    Results go through PAPER_CACHE: fresh entries are served directly, stale
+    ones are served while a background refresh runs, and failures are only
+    cached for a short time. Concurrent misses for the same problem share one
+    fetch.
     
-    try:
-        search_query = extract_key_terms(problem)
-        print(f"🔑 Using search query: {search_query}")
-        
-        url = "https://api.semanticscholar.org/graph/v1/paper/search"
-        params = {
-            "query": search_query,
-            "limit": limit,
-            "fields": "title,abstract,authors,year,citationCount"
-        }
-        
-        headers = {
-            "User-Agent": "Research-Companion-AI/1.0"
-        }
-        response = requests.get(url, params=params, headers=headers, timeout=15)
-        print(f"📡 API Response Status: {response.status_code}")
-        response.raise_for_status()
-        data = response.json()
-        print(f"📄 API Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
-        
-        papers = []
-        if "data" in data and data["data"]:
-            print(f"📊 Found {len(data['data'])} papers in API response")
-            for idx, paper in enumerate(data["data"]):
-                print(f"   Processing paper {idx + 1}: {paper.get('title', 'No title')[:50]}...")
-                paper_text = ""
-                if paper.get("title"):
-                    paper_text += paper["title"] + ". "
-                if paper.get("abstract"):
-                    paper_text += paper.get("abstract", "")
-                
-                if paper_text.strip():
-                    authors_list = []
-                    if paper.get("authors"):
-                        for a in paper.get("authors", []):
-                            if isinstance(a, dict) and a.get("name"):
-                                authors_list.append(a.get("name"))
-                            elif isinstance(a, str):
-                                authors_list.append(a)
-                    
-                    papers.append({
-                        "title": paper.get("title", "") or "",
-                        "abstract": paper.get("abstract", "") or "",
-                        "text": paper_text.strip(),
-                        "authors": authors_list,
-                        "year": paper.get("year"),
-                        "citations": paper.get("citationCount", 0)
-                    })
+    With SEMANTIC_CACHE on, a problem with no exact entry is embedded and
+    matched against the problems already cached (see problem_index.py); a
+    close enough one lends its papers in its own order. find_papers re-ranks
+    them for this problem (see combine_papers); direct callers get that
+    problem's ordering.
+    """
+    with metrics.stage("papers"):
+        key, query, vector = paper_cache_key(problem)
         
-        PAPER_CACHE[problem_hash] = papers
-        print(f"✅ Fetched {len(papers)} papers")
-        if len(papers) == 0:
-            print(f"⚠️ Warning: No papers found. API response: {data}")
-        return papers
+        def load():
+            # A stale semantic hit is refreshed with the problem it was cached for.
+            return index_papers(search_papers(query, limit))
         
+        papers = PAPER_FLIGHTS.do(key, lambda: PAPER_CACHE.get_or_fetch(key, load))
+        remember_problem(problem, key, vector, papers)
+    return papers
+
+def paper_cache_key(problem: str) -> Tuple[str, str, Optional[np.ndarray]]:
+    """
+    Resolve the paper-cache entry for ``problem``.
+    
+    Returns ``(key, query, vector)``: the cache key to use (the problem's own
+    hash, or a near-duplicate problem's on a semantic hit), the problem text
+    a fetch for that key should search with, and the problem embedding when
+    it still has to be added to the problem index (else None).
+    """
+    problem_hash = get_problem_hash(problem)
+    key, query, vector = problem_hash, problem, None
+    if problem_hash in PAPER_CACHE:
+        result = "hit"
+        if SEMANTIC_CACHE and problem_hash not in get_problem_index():
+            # Cached before the problem index existed (or evicted from it).
+            vector = embed_cached([problem])[0]
+    elif SEMANTIC_CACHE:
+        vector = embed_cached([problem])[0]
+        match, similarity = get_problem_index().nearest(vector, lambda k: bool(PAPER_CACHE.lookup(k)[0]))
+        result = "miss"
+        if match is not None:
+            result = "semantic_hit"
+            key, query = match, get_problem_index().problem(match) or problem
+            log.debug("semantic paper cache hit", extra={
+                "problem": problem[:50], "cached_problem": query[:50], "similarity": round(similarity, 3)})
+    else:
+        result = "miss"
+    CACHE_LOOKUPS.inc(cache="papers", result=result)
+    return key, query, vector
+
+def index_papers(papers: List[Dict]) -> List[Dict]:
+    """Embed freshly fetched papers and add them to the lexical index."""
+    paper_embeddings(papers)
+    if LEXICAL_INDEX is not None:
+        LEXICAL_INDEX.add_many((paper_id(paper), paper) for paper in papers)
+    return papers
+
+def remember_problem(problem: str, key: str, vector: Optional[np.ndarray], papers: List[Dict]):
+    """Add ``problem`` to the problem index once it has papers, and attach their vectors."""
+    if vector is not None and key == get_problem_hash(problem) and papers:
+        get_problem_index().add(key, problem, vector)
+    paper_embeddings(papers)
+    PAPER_CACHE.account(key)
+
+SCHOLAR_REQUESTS = metrics.counter("scholar_searches_total", "Semantic Scholar searches by result")
+
+def search_papers(problem: str, limit: int = 10) -> List[Dict]:
+    """
+    Query the Semantic Scholar search API for papers matching the problem.
+    Raises on request failures so callers can tell them apart from empty results.
+    """
+    search_query = extract_key_terms(problem)
+    log.debug("searching papers", extra={"problem": problem[:50], "query": search_query})
+    with scholar_search(search_query):
+        data = SCHOLAR_CLIENT.search(search_query, limit)
+    return parse_papers(data, search_query)
+
+@contextmanager
+def scholar_search(search_query: str):
+    """Time a Semantic Scholar search and count and log its outcome; errors are re-raised."""
+    try:
+        with metrics.stage("scholar_search"):
+            yield
     except requests.exceptions.HTTPError as e:
-        print(f"⚠️ HTTP Error fetching papers: {e}")
-        print(f"   Response: {e.response.text if hasattr(e, 'response') else 'No response'}")
-        return []
+        SCHOLAR_REQUESTS.inc(result="http_error")
+        log.warning("paper search failed", extra={
+            "query": search_query, "error": str(e),
+            "response": e.response.text[:200] if e.response is not None else None,
+        })
+        raise
     except requests.exceptions.RequestException as e:
-        print(f"⚠️ Request Error fetching papers: {e}")
-        return []
-    except Exception as e:
-        print(f"⚠️ Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+        SCHOLAR_REQUESTS.inc(result="request_error")
+        log.warning("paper search failed", extra={"query": search_query, "error": str(e)})
+        raise
+    except Exception:
+        SCHOLAR_REQUESTS.inc(result="error")
+        log.exception("paper search failed", extra={"query": search_query})
+        raise
+    SCHOLAR_REQUESTS.inc(result="ok")
+
+def parse_papers(data: Dict, search_query: str) -> List[Dict]:
+    """Paper dicts (title, abstract, text, authors, year, citations) from a search response."""
+    papers = []
+    for paper in (data.get("data") or []) if isinstance(data, dict) else []:
+        log.debug("paper", extra={"title": (paper.get("title") or "")[:50]})
+        paper_text = ""
+        if paper.get("title"):
+            paper_text += paper["title"] + ". "
+        if paper.get("abstract"):
+            paper_text += paper.get("abstract", "")
+        
+        if paper_text.strip():
+            authors_list = []
+            if paper.get("authors"):
+                for a in paper.get("authors", []):
+                    if isinstance(a, dict) and a.get("name"):
+                        authors_list.append(a.get("name"))
+                    elif isinstance(a, str):
+                        authors_list.append(a)
+            
+            papers.append({
+                "title": paper.get("title", "") or "",
+                "abstract": paper.get("abstract", "") or "",
+                "text": paper_text.strip(),
+                "authors": authors_list,
+                "year": paper.get("year"),
+                "citations": paper.get("citationCount", 0)
+            })
+    
+    if papers:
+        log.info("papers fetched", extra={"query": search_query, "count": len(papers)})
+    else:
+        log.warning("no papers found", extra={"query": search_query})
+    return papers
 
 STRONG_CLAIMS = [
     "demonstrates", "proves", "causes", "leads to",
@@ -148,69 +820,144 @@ def is_strong_claim(s):
 def has_evidence(s):
     return bool(re.search(r"\d+|\(|\)|\[\w+\]", s))
 
-def score_paragraph(paragraph, problem, research_papers=None):
+def score_paragraph(paragraph, problem, research_papers=None, session_id=None, incremental=False):
     """
     Score paragraph based on comparison with research papers and other factors.
     
+    Paragraph, problem and sentences are encoded in one batch, paper vectors
+    come from the embedding store, and every metric is read from a single
+    similarity matrix over those rows. With a local corpus, the paragraph's
+    nearest corpus papers are also considered for novelty.
+    
     Args:
         paragraph: The user's paragraph to score
         problem: The research problem statement
         research_papers: List of research papers fetched for the problem
+        session_id: Session whose earlier paragraphs are the novelty fallback;
+            the paragraph is added to that history after scoring
+        incremental: Approximate the paragraph embedding by the mean of its
+            (cached) sentence embeddings instead of encoding the whole text,
+            so only edited sentences reach the model
     
     Returns:
         Dictionary with score and breakdown
     """
-    para_emb = embed(paragraph)
-    prob_emb = embed(problem)
-    
     if research_papers is None:
-        research_papers = fetch_research_papers(problem)
+        research_papers = find_papers(problem)
+    
+    text_embs = text_embeddings(paragraph, problem, sent_tokenize(paragraph), incremental)
+    return score_text_embeddings(paragraph, text_embs, research_papers, session_id)
+
+def text_embeddings(paragraph, problem, sentences, incremental=False) -> np.ndarray:
+    """
+    Encode ``[paragraph, problem, *sentences]`` with at most one model call.
+    
+    Problem and sentences come from the sentence cache when possible. The
+    paragraph is encoded with them, or, with ``incremental``, approximated
+    by the mean of its sentence vectors. Both /score tiers build their rows
+    here, so a live alignment matches the full one it is shown next to.
+    """
+    if incremental and sentences:
+        text_embs = embed_cached([problem] + sentences)
+        para_emb = text_embs[1:].mean(axis=0)
+        para_emb /= np.linalg.norm(para_emb) or 1.0
+        return np.vstack([para_emb, text_embs])
+    return embed_cached([problem] + sentences, uncached=[paragraph])
+
+def score_text_embeddings(paragraph, text_embs, research_papers, session_id=None):
+    """
+    Score a paragraph whose [paragraph, problem, *sentences] rows are already encoded.
+    
+    Adds the paper rows (and local corpus neighbours), scores them with
+    score_from_embeddings and records the paragraph in the session history.
+    """
+    neighbours = []
+    if LOCAL_CORPUS is not None:
+        neighbours = merge_papers(research_papers, LOCAL_CORPUS.search_papers(text_embs[0], NOVELTY_NEIGHBOURS))
+        neighbours = neighbours[len(research_papers):]
+    paper_rows = paper_embeddings(list(research_papers) + list(neighbours))
+    
+    with metrics.stage("score"):
+        result = score_from_embeddings(text_embs, paper_rows, research_papers, session_id, neighbours)
+    if session_id is not None:
+        PARAGRAPH_HISTORY.add(session_id, paragraph, text_embs[0])
+    return result
+
+def score_from_embeddings(text_embs, paper_rows, research_papers, session_id=None, neighbours=()):
+    """
+    Compute the score breakdown from encoded text and (possibly quantized) paper chunk rows.
+    
+    Args:
+        text_embs: float32 matrix with rows [paragraph, problem, *sentences]
+        paper_rows: ``(codes, scales, offsets)`` from paper_embeddings for
+            [*research_papers, *neighbours]; a paper's similarity is its best chunk's
+        research_papers: Papers for the problem; used for novelty and relevance
+        session_id: Session history used for novelty when there are no papers
+        neighbours: Extra papers that only count towards novelty
+    
+    Returns:
+        Dictionary with score and breakdown
+    """
+    sim = text_embs @ text_embs.T
+    n_sentences = len(text_embs) - 2
+    sent_start, paper_start = 2, 2 + n_sentences
     
     novelty = 1.0
     novelty_details = {"max_similarity": 0, "similar_papers": []}
     
-    if research_papers:
-        paper_similarities = []
-        for paper in research_papers:
-            paper_emb = embed(paper["text"][:1000])
-            sim = cosine(para_emb, paper_emb)
-            paper_similarities.append((sim, paper["title"]))
-        
-        if paper_similarities:
-            max_sim = max(paper_similarities, key=lambda x: x[0])[0]
-            novelty = 1 - max_sim
-            novelty_details["max_similarity"] = round(max_sim, 3)
-            top_similar = sorted(paper_similarities, key=lambda x: x[0], reverse=True)[:3]
-            novelty_details["similar_papers"] = [
-                {"title": title, "similarity": round(sim, 3)} 
-                for sim, title in top_similar
-            ]
-    elif PARAGRAPH_HISTORY:
-        sims = [cosine(para_emb, embed(p)) for p in PARAGRAPH_HISTORY]
-        novelty = 1 - max(sims) if sims else 1.0
-
-    alignment = cosine(para_emb, prob_emb)
+    sims, best_chunk = paper_similarities(*paper_rows, text_embs[0])
+    paper_sims = [float(x) for x in sims]
+    if paper_sims:
+        candidates = list(research_papers) + list(neighbours)
+        per_paper = [(s, paper, int(c)) for s, paper, c in zip(paper_sims, candidates, best_chunk)]
+        max_sim = max(s for s, _, _ in per_paper)
+        novelty = 1 - max_sim
+        novelty_details["max_similarity"] = round(max_sim, 3)
+        top_similar = sorted(per_paper, key=lambda x: x[0], reverse=True)[:3]
+        novelty_details["similar_papers"] = [
+            {"id": paper_id(paper), "title": paper["title"], "similarity": round(s, 3),
+             "passage": paper_passage(paper, c)}
+            for s, paper, c in top_similar
+        ]
+        novelty_details["papers"] = [
+            {"id": paper_id(paper), "similarity": round(s, 3), "chunk": c}
+            for s, paper, c in per_paper[:len(research_papers)]
+        ]
+    elif session_id is not None:
+        history_sim = PARAGRAPH_HISTORY.max_similarity(session_id, text_embs[0])
+        if history_sim is not None:
+            novelty = 1 - history_sim
+
+    alignment = float(sim[0, 1])
 
-    sentences = sent_tokenize(paragraph)
-    sent_embs = [embed(s) for s in sentences]
     coherence = 1.0
-    if len(sent_embs) > 1:
-        sims = [cosine(sent_embs[i], sent_embs[i+1]) for i in range(len(sent_embs)-1)]
+    if n_sentences > 1:
+        sims = [float(x) for x in np.diagonal(sim[sent_start:paper_start, sent_start:paper_start], offset=1)]
         coherence = sum(sims) / len(sims)
     
     relevance = 0.5
-    if research_papers:
-        paper_embs = [embed(p["text"][:1000]) for p in research_papers]
-        relevance_sims = [cosine(para_emb, p_emb) for p_emb in paper_embs]
-        relevance = sum(relevance_sims) / len(relevance_sims) if relevance_sims else 0.5
+    relevance_sims = paper_sims[:len(research_papers)]
+    if relevance_sims:
+        relevance = sum(relevance_sims) / len(relevance_sims)
+
+    return {
+        **score_breakdown(novelty, alignment, coherence, relevance),
+        "novelty_details": novelty_details,
+        "papers_count": len(research_papers)
+    }
 
+# /score tiers: "live" rescores only what changes while typing, "full" compares papers.
+TIERS = ("live", "full")
+SCORE_TIERS = metrics.counter("score_tiers_total", "/score requests by requested and served tier")
+
+def score_breakdown(novelty, alignment, coherence, relevance) -> Dict:
+    """The overall score and the per-metric breakdown, in points."""
     score = (
         0.25 * novelty +
         0.25 * alignment +
         0.25 * coherence +
         0.25 * relevance
     )
-
     return {
         "score": round(max(0, min(1, score)) * 100, 1),
         "breakdown": {
@@ -218,19 +965,110 @@ def score_paragraph(paragraph, problem, research_papers=None):
             "alignment": round(alignment * 100, 1),
             "coherence": round(coherence * 100, 1),
             "relevance": round(relevance * 100, 1)
-        },
-        "novelty_details": novelty_details,
-        "papers_count": len(research_papers)
+        }
     }
 
-def analyze_sentences(paragraph, problem):
+def score_live(paragraph, problem, full, session_id=None, revision=None) -> Dict:
+    """
+    The live tier of /score: only what changes from keystroke to keystroke.
+    
+    Alignment, coherence and the sentence feedback are computed for the
+    current text; novelty and relevance (and their details) are the ones of
+    ``full``, the session's last full-tier result for this problem. No paper
+    is looked up or compared, and only sentences the sentence cache has not
+    seen reach the model. The paragraph vector is built the way ``full``
+    built its own (see text_embeddings), so alignment does not jump when
+    the next full result arrives.
+    """
     sentences = sent_tokenize(paragraph)
-    prob_emb = embed(problem)
-    results = []
+    REVISIONS.check(session_id, revision, "embed")
+    text_embs = text_embeddings(paragraph, problem, sentences, full.get("incremental", False))
+    embs = text_embs[1:]
+    with metrics.stage("score"):
+        sentence_embs = embs[1:]
+        alignment = float(text_embs[0] @ embs[0])
+        coherence = 1.0
+        if len(sentences) > 1:
+            coherence = float(np.mean(np.sum(sentence_embs[:-1] * sentence_embs[1:], axis=1)))
+        result = score_breakdown(full["breakdown"]["novelty"] / 100, alignment, coherence,
+                                 full["breakdown"]["relevance"] / 100)
+    REVISIONS.check(session_id, revision, "analyze")
+    return {
+        **result,
+        "novelty_details": full["novelty_details"],
+        "papers_count": full["papers_count"],
+        "sentences": analyze_sentences(paragraph, problem, sentences, embs),
+    }
+
+def tier_fields(tier: str, full: Optional[Dict] = None) -> Dict:
+    """``tier`` of the response, the tier behind each number, and the age of reused full-tier numbers."""
+    fields = {
+        "tier": tier,
+        "tiers": {"score": tier, "alignment": tier, "coherence": tier, "sentences": tier,
+                  "novelty": "full", "relevance": "full"}
+    }
+    if full is not None:
+        fields["full_age"] = round(time.time() - full["at"], 1)
+    return fields
+
+def remember_full(session_id, problem, score_result, papers_part, incremental=False):
+    """Keep a full-tier result (and how its paragraph vector was built) for the session's next live-tier requests."""
+    SENTENCE_CACHE.put_full(session_id, get_problem_hash(problem), {
+        "incremental": incremental,
+        "breakdown": score_result["breakdown"],
+        "novelty_details": score_result["novelty_details"],
+        "papers_count": score_result["papers_count"],
+        "paper_set": papers_part["paper_set"],
+        "paper_ids": papers_part["paper_ids"],
+        "at": time.time()
+    })
+
+def live_base(paragraph, problem, session_id, tier) -> Optional[Dict]:
+    """
+    The full-tier result a live request can build on, or None when the full
+    tier has to run: it was asked for, the paragraph is too short to score,
+    or the session has no full result for this problem yet.
+    """
+    full = None
+    if tier == "live" and len(paragraph) >= 20 and session_id is not None:
+        full = SENTENCE_CACHE.get_full(session_id, get_problem_hash(problem))
+    SCORE_TIERS.inc(requested=tier, served="full" if full is None else "live")
+    return full
+
+def analyze_sentences(paragraph, problem, sentences=None, embs=None):
+    with metrics.stage("analyze"):
+        return list(iter_analyze_sentences(paragraph, problem, sentences, embs))
+
+def iter_analyze_sentences(paragraph, problem, sentences=None, embs=None):
+    """
+    Yield the feedback for each sentence of the paragraph as soon as it is ready.
+    
+    Callers that already split the paragraph and encoded ``[problem] + sentences``
+    can pass both in.
+    """
+    offsets = [(start, end) for _, start, end in sentence_segments(paragraph)]
+    if sentences is None:
+        sentences = sent_tokenize(paragraph)
+    problem_hash = get_problem_hash(problem)
+    cached = [SENTENCE_CACHE.get_analysis(s, problem_hash) for s in sentences]
+    if all(issues is not None for issues in cached):
+        for s, (start, end), issues in zip(sentences, offsets, cached):
+            yield {"sentence": s, "start": start, "end": end, "issues": issues}
+        return
+    if embs is None:
+        embs = embed_cached([problem] + sentences)
+    alignments = [float(x) for x in embs[1:] @ embs[0]]
+    for item in iter_sentence_feedback(sentences, alignments, offsets):
+        SENTENCE_CACHE.put_analysis(item["sentence"], problem_hash, item["issues"])
+        yield item
+
+def build_sentence_feedback(sentences, alignments, offsets=None):
+    """Build per-sentence issues from each sentence's alignment with the problem."""
+    return list(iter_sentence_feedback(sentences, alignments, offsets))
 
-    for s in sentences:
-        emb = embed(s)
-        alignment = cosine(emb, prob_emb)
+def iter_sentence_feedback(sentences, alignments, offsets=None):
+    """Feedback items for ``sentences``; with ``(start, end)`` ``offsets``, the items carry them too."""
+    for i, (s, alignment) in enumerate(zip(sentences, alignments)):
         issues = []
 
         if alignment < 0.25:
@@ -245,12 +1083,11 @@ def analyze_sentences(paragraph, problem):
                 "suggestion": "Add a statistic, citation, or reference."
             })
 
-        results.append({
-            "sentence": s,
-            "issues": issues
-        })
-
-    return results
+        item = {"sentence": s}
+        if offsets is not None:
+            item["start"], item["end"] = offsets[i]
+        item["issues"] = issues
+        yield item
 
 @app.route("/test-papers", methods=["GET", "OPTIONS"])
 def test_papers():
@@ -263,22 +1100,39 @@ def test_papers():
     if not problem:
         return jsonify({"error": "Problem parameter is required"}), 400
     
-    papers = fetch_research_papers(problem, limit=10)
-    
-    papers_for_response = []
-    for paper in papers:
-        papers_for_response.append({
-            "title": paper.get("title", ""),
-            "abstract": paper.get("abstract", ""),
-            "authors": paper.get("authors", []),
-            "year": paper.get("year"),
-            "citations": paper.get("citations", 0)
-        })
-    
-    return jsonify({
-        "papers": papers_for_response,
-        "papers_count": len(papers_for_response)
+    papers = find_papers(problem, limit=10)
+    return paper_set_response(*register_paper_set(papers))
+
+def paper_set_response(set_id: str, papers: List[Dict], req=None):
+    """JSON list of ``papers`` with the set id as ETag; a 304 when the client already has it."""
+    response = jsonify({
+        "paper_set": set_id,
+        "papers": papers,
+        "papers_count": len(papers)
     })
+    response.set_etag(set_id)
+    response.cache_control.no_cache = True  # revalidate, then reuse
+    return response.make_conditional(req or request)
+
+@app.route("/papers/<set_id>", methods=["GET", "OPTIONS"])
+def paper_set(set_id):
+    """
+    Metadata of a paper set named by /score or /test-papers.
+    
+    The id is derived from the papers themselves, so the response never
+    changes and may be cached for good.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+    papers = PAPER_SETS.get(set_id)
+    if papers is None:
+        return jsonify({"error": "Unknown or expired paper set"}), 404
+    response = paper_set_response(set_id, papers)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    response.cache_control.immutable = True
+    return response
 
 @app.route("/score", methods=["POST", "OPTIONS"])
 def score():
@@ -288,50 +1142,529 @@ def score():
     data = request.json or {}
     paragraph = clean(data.get("paragraph"))
     problem = clean(data.get("problem", "research problem"))
+    session_id = get_session_id(data)
+    incremental = bool(data.get("incremental"))
+    known_set = data.get("paper_set")
+    revision = get_revision(data)
+    tier = str(data.get("tier") or "full").lower()
+    if tier not in TIERS:
+        return jsonify({"error": "tier must be 'live' or 'full'"}), 400
+    REVISIONS.begin(session_id, revision)
+    full = live_base(paragraph, problem, session_id, tier)
+    
+    stream = data.get("stream") or request.args.get("stream")
+    if stream:
+        sse = stream == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+        return stream_score(paragraph, problem, session_id, incremental, sse, known_set, revision, full)
 
-    print(f"\n{'='*60}")
-    print(f"📝 Request received - Problem: {problem[:100]}")
-    print(f"📝 Paragraph length: {len(paragraph)}")
-    research_papers = fetch_research_papers(problem)
-    print(f"📚 Papers fetched: {len(research_papers)}")
-    print(f"{'='*60}\n")
-    
-    papers_for_response = []
-    for paper in research_papers:
-        papers_for_response.append({
-            "title": paper.get("title", ""),
-            "abstract": paper.get("abstract", ""),
-            "authors": paper.get("authors", []),
-            "year": paper.get("year"),
-            "citations": paper.get("citations", 0)
-        })
+    research_papers = None
+    if full is None:
+        REVISIONS.check(session_id, revision, "papers")
+        research_papers = find_papers(problem)
+        log.debug("score request", extra={"problem": problem[:100], "paragraph_length": len(paragraph),
+                                          "papers": len(research_papers)})
+    return jsonify(score_response(paragraph, problem, research_papers, session_id, incremental, known_set,
+                                  revision, full))
+
+@app.errorhandler(Superseded)
+def superseded(error):
+    """A newer revision from the same editor overtook this request (see revisions.py)."""
+    return jsonify(superseded_fields(error)), 409
+
+def superseded_fields(error: Superseded) -> Dict:
+    return {"error": "superseded", "revision": error.revision, "latest": error.latest, "stage": error.stage}
+
+def score_response(paragraph, problem, research_papers, session_id=None, incremental=False,
+                   known_set=None, revision=None, full=None) -> Dict:
+    """
+    The /score response body for ``paragraph`` scored against ``research_papers``.
+    
+    ``paper_set`` names the paper list (see GET /papers/<id>); when it equals
+    ``known_set`` -- the set the client sent back -- ``papers`` is left out
+    and the client reuses its copy. With a ``revision``, raises Superseded
+    before embedding or sentence analysis once a newer revision of the
+    session has arrived. With ``full`` (see live_base) the live tier answers
+    instead and ``research_papers`` is not used.
+    """
+    if full is not None:
+        result = score_live(paragraph, problem, full, session_id, revision)
+        feedback = result.pop("sentences")
+        if incremental:
+            changed = SENTENCE_CACHE.changed(session_id, [item["sentence"] for item in feedback])
+            feedback = [dict(item, changed=flag) for item, flag in zip(feedback, changed)]
+        return {**result, **live_paper_fields(full, known_set), "sentences": feedback, **tier_fields("live", full)}
+    
+    set_id, papers_for_response = register_paper_set(research_papers)
+    papers_part = paper_set_fields(set_id, papers_for_response, known_set)
     
     if len(paragraph) < 20:
-        return jsonify({
+        return {
             "score": 0, 
             "sentences": [],
             "breakdown": {},
             "papers_count": len(research_papers),
-            "papers": papers_for_response if papers_for_response else []
-        })
+            **papers_part
+        }
     
-    score_result = score_paragraph(paragraph, problem, research_papers)
-    sentence_feedback = analyze_sentences(paragraph, problem)
+    REVISIONS.check(session_id, revision, "embed")
+    score_result = score_paragraph(paragraph, problem, research_papers, session_id, incremental=incremental)
+    REVISIONS.check(session_id, revision, "analyze")
+    feedback = analyze_sentences(paragraph, problem)
+    if incremental:
+        changed = SENTENCE_CACHE.changed(session_id, [item["sentence"] for item in feedback])
+        feedback = [dict(item, changed=flag) for item, flag in zip(feedback, changed)]
+    remember_full(session_id, problem, score_result, papers_part, incremental)
 
-    PARAGRAPH_HISTORY.append(paragraph)
+    return {
+        "score": score_result["score"],
+        "breakdown": score_result["breakdown"],
+        "novelty_details": score_result["novelty_details"],
+        "papers_count": score_result["papers_count"],
+        **papers_part,
+        "sentences": feedback,
+        **tier_fields("full")
+    }
 
-    return jsonify({
+def paper_set_fields(set_id: str, papers: List[Dict], known_set=None) -> Dict:
+    """``paper_set`` and ``paper_ids``, plus the full ``papers`` unless the client holds that set."""
+    fields = {"paper_set": set_id, "paper_ids": [paper["id"] for paper in papers]}
+    if set_id != known_set:
+        fields["papers"] = papers
+    return fields
+
+def live_paper_fields(full: Dict, known_set=None) -> Dict:
+    """paper_set_fields for a live response: the papers of the full result it reuses."""
+    fields = {"paper_set": full["paper_set"], "paper_ids": full["paper_ids"]}
+    papers = PAPER_SETS.get(full["paper_set"]) if full["paper_set"] != known_set else None
+    if papers is not None:
+        fields["papers"] = papers
+    return fields
+
+def iter_score_events(paragraph, problem, session_id=None, incremental=False, research_papers=None,
+                      known_set=None, revision=None, full=None):
+    """
+    Yield the /score result in stages: papers, then the score breakdown, then
+    one event per sentence, then ``done``. The papers event carries only ids
+    when ``known_set`` is the current paper set (see score_response). Once a
+    newer ``revision`` of the session arrives, a ``superseded`` event ends
+    the stream instead. With ``full`` the events carry the live tier (see
+    score_response).
+    """
+    try:
+        if full is not None:
+            yield from _iter_live_events(paragraph, problem, session_id, incremental, known_set, revision, full)
+            return
+        yield from _iter_score_events(paragraph, problem, session_id, incremental, research_papers, known_set,
+                                      revision)
+    except Superseded as error:
+        yield {"event": "superseded", **superseded_fields(error)}
+
+def _iter_score_events(paragraph, problem, session_id, incremental, research_papers, known_set, revision):
+    if research_papers is None:
+        REVISIONS.check(session_id, revision, "papers")
+        research_papers = find_papers(problem)
+    set_id, papers_for_response = register_paper_set(research_papers)
+    yield {
+        "event": "papers",
+        **paper_set_fields(set_id, papers_for_response, known_set),
+        "papers_count": len(research_papers)
+    }
+    
+    if len(paragraph) < 20:
+        yield {"event": "score", "score": 0, "breakdown": {}, "papers_count": len(research_papers)}
+        yield {"event": "done", "sentences_count": 0}
+        return
+    
+    REVISIONS.check(session_id, revision, "embed")
+    score_result = score_paragraph(paragraph, problem, research_papers, session_id, incremental=incremental)
+    yield {
+        "event": "score",
         "score": score_result["score"],
         "breakdown": score_result["breakdown"],
         "novelty_details": score_result["novelty_details"],
         "papers_count": score_result["papers_count"],
-        "papers": papers_for_response if papers_for_response else [],
-        "sentences": sentence_feedback
+        **tier_fields("full")
+    }
+    remember_full(session_id, problem, score_result, paper_set_fields(set_id, papers_for_response), incremental)
+    
+    changed = None
+    if incremental:
+        changed = SENTENCE_CACHE.changed(session_id, sent_tokenize(paragraph))
+    count = 0
+    REVISIONS.check(session_id, revision, "analyze")
+    for i, item in enumerate(iter_analyze_sentences(paragraph, problem)):
+        if changed is not None:
+            item = dict(item, changed=changed[i])
+        yield dict(item, event="sentence", index=i)
+        count += 1
+        # Checked between sentences: each one is analysed only when the next event is pulled.
+        REVISIONS.check(session_id, revision, "analyze")
+    yield {"event": "done", "sentences_count": count}
+
+def _iter_live_events(paragraph, problem, session_id, incremental, known_set, revision, full):
+    result = score_response(paragraph, problem, None, session_id, incremental, known_set, revision, full)
+    sentences = result.pop("sentences")
+    yield {"event": "papers", **live_paper_fields(full, known_set), "papers_count": full["papers_count"]}
+    yield {"event": "score", **{k: v for k, v in result.items() if k not in ("paper_set", "paper_ids", "papers")}}
+    for i, item in enumerate(sentences):
+        yield dict(item, event="sentence", index=i)
+    yield {"event": "done", "sentences_count": len(sentences)}
+
+def stream_score(paragraph, problem, session_id, incremental, sse=False, known_set=None, revision=None,
+                 full=None):
+    """Stream iter_score_events as NDJSON, or as Server-Sent Events when ``sse`` is set."""
+    return stream_events(iter_score_events(paragraph, problem, session_id, incremental, known_set=known_set,
+                                           revision=revision, full=full), sse)
+
+def stream_events(events, sse=False):
+    """Response streaming ``events`` as NDJSON, or as Server-Sent Events when ``sse`` is set."""
+    def generate():
+        for event in events:
+            payload = json.dumps(event)
+            if sse:
+                yield f"event: {event['event']}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+    
+    mimetype = "text/event-stream" if sse else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+MAX_BATCH_PARAGRAPHS = int(os.environ.get("MAX_BATCH_PARAGRAPHS", "500"))
+
+def score_documents(groups, session_id=None):
+    """
+    Score many paragraphs, grouped by problem, with one model call.
+    
+    Papers are looked up and embedded once per problem. All paragraphs,
+    problems and sentences are encoded together, then each paragraph is
+    scored through score_text_embeddings and build_sentence_feedback, the
+    same code paths /score uses.
+    
+    Args:
+        groups: List of {"problem": str, "paragraphs": [str]}
+        session_id: Session used for the novelty history fallback
+    
+    Returns:
+        Dictionary with paper metadata by id and per-problem results
+    """
+    papers_by_id = {}
+    group_papers = []
+    for group in groups:
+        papers = find_papers(group["problem"])
+        paper_embeddings(papers)
+        for paper in papers:
+            papers_by_id.setdefault(paper_id(paper), paper_metadata(paper))
+        group_papers.append(papers)
+    
+    scored, problems, sentences = [], [], []
+    for gi, group in enumerate(groups):
+        problems.append(group["problem"])
+        for p, paragraph in enumerate(group["paragraphs"]):
+            if len(paragraph) < 20:
+                continue
+            sents = sent_tokenize(paragraph)
+            scored.append((gi, p, paragraph, len(sentences), sents))
+            sentences.extend(sents)
+    
+    embs = embed_cached(problems + sentences, uncached=[item[2] for item in scored])
+    para_rows = embs[:len(scored)]
+    prob_rows = embs[len(scored):len(scored) + len(problems)]
+    sent_rows = embs[len(scored) + len(problems):]
+    
+    results = []
+    for group, papers in zip(groups, group_papers):
+        results.append({
+            "problem": group["problem"],
+            "paper_ids": [paper_id(paper) for paper in papers],
+            "papers_count": len(papers),
+            "paragraphs": [
+                {"score": 0, "sentences": [], "breakdown": {}, "papers_count": len(papers)}
+                for _ in group["paragraphs"]
+            ],
+        })
+    
+    for i, (gi, p, paragraph, start, sents) in enumerate(scored):
+        rows = sent_rows[start:start + len(sents)]
+        text_embs = np.vstack([para_rows[i:i + 1], prob_rows[gi:gi + 1], rows])
+        score_result = score_text_embeddings(paragraph, text_embs, group_papers[gi], session_id)
+        alignments = [float(x) for x in rows @ prob_rows[gi]]
+        results[gi]["paragraphs"][p] = {
+            "score": score_result["score"],
+            "breakdown": score_result["breakdown"],
+            "novelty_details": score_result["novelty_details"],
+            "papers_count": score_result["papers_count"],
+            "sentences": build_sentence_feedback(sents, alignments,
+                                                 [(start, end) for _, start, end in sentence_segments(paragraph)])
+        }
+    
+    for gi, result in enumerate(results):
+        result["document_score"] = aggregate_scores(result["paragraphs"], groups[gi]["paragraphs"])
+    all_paragraphs = [r for result in results for r in result["paragraphs"]]
+    all_texts = [text for group in groups for text in group["paragraphs"]]
+    
+    return {
+        "papers": papers_by_id,
+        "results": results,
+        "document_score": aggregate_scores(all_paragraphs, all_texts)
+    }
+
+def aggregate_scores(results, paragraphs):
+    """Length-weighted average of paragraph scores and breakdowns, skipping unscored paragraphs."""
+    pairs = [(r, len(text)) for r, text in zip(results, paragraphs) if r.get("breakdown")]
+    total = sum(weight for _, weight in pairs)
+    if not total:
+        return {"score": 0, "breakdown": {}, "paragraphs_scored": 0}
+    keys = pairs[0][0]["breakdown"].keys()
+    return {
+        "score": round(sum(r["score"] * w for r, w in pairs) / total, 1),
+        "breakdown": {
+            k: round(sum(r["breakdown"][k] * w for r, w in pairs) / total, 1) for k in keys
+        },
+        "paragraphs_scored": len(pairs)
+    }
+
+@app.route("/score/batch", methods=["POST", "OPTIONS"])
+def score_batch():
+    """Score a whole document: many paragraphs under one problem, or several problems."""
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+    
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "The request body must be a JSON object"}), 400
+    if "problems" in data:
+        raw_groups = data.get("problems") or []
+        if not isinstance(raw_groups, list):
+            return jsonify({"error": "problems must be a list"}), 400
+    else:
+        raw_groups = [{"problem": data.get("problem", "research problem"), "paragraphs": data.get("paragraphs")}]
+    
+    groups = []
+    for group in raw_groups:
+        paragraphs = group.get("paragraphs") if isinstance(group, dict) else None
+        if not isinstance(paragraphs, list):
+            return jsonify({"error": "Each problem needs a list of paragraphs"}), 400
+        if not isinstance(group.get("problem", ""), str):
+            return jsonify({"error": "problem must be a string"}), 400
+        groups.append({
+            "problem": clean(group.get("problem", "research problem")),
+            "paragraphs": [clean(p) if isinstance(p, str) else "" for p in paragraphs]
+        })
+    
+    if not groups:
+        return jsonify({"error": "At least one problem with paragraphs is required"}), 400
+    if sum(len(group["paragraphs"]) for group in groups) > MAX_BATCH_PARAGRAPHS:
+        return jsonify({"error": f"At most {MAX_BATCH_PARAGRAPHS} paragraphs per request"}), 400
+    
+    return jsonify(score_documents(groups, get_session_id(data)))
+
+MANUSCRIPT_BATCH_SIZE = int(os.environ.get("MANUSCRIPT_BATCH_SIZE", "32"))
+
+def iter_manuscript_events(lines, problem, batch_size=MANUSCRIPT_BATCH_SIZE, detail=False):
+    """
+    Score a manuscript read from ``lines`` and yield results as they are ready.
+    
+    The text is split by manuscript.iter_paragraphs and scored batch_size
+    paragraphs at a time through score_documents. Events: ``papers`` once,
+    one ``paragraph`` per chunk, a ``section`` summary when a section ends,
+    and a final ``document`` summary with the most and least novel passages
+    and the coherence across paragraph boundaries (similarity between the
+    last sentence of a paragraph and the first sentence of the next).
+    """
+    research_papers = find_papers(problem)
+    yield {
+        "event": "papers",
+        **paper_set_fields(*register_paper_set(research_papers)),
+        "papers_count": len(research_papers)
+    }
+    
+    stats = ManuscriptStats()
+    index = 0
+    previous_last = None
+    for batch in iter_batches(iter_paragraphs(lines), batch_size):
+        texts = [clean(text) for _, text in batch]
+        results = score_documents([{"problem": problem, "paragraphs": texts}])["results"][0]["paragraphs"]
+        
+        edges = [(r["sentences"][0]["sentence"], r["sentences"][-1]["sentence"]) if r["sentences"] else None
+                 for r in results]
+        edge_texts = [t for edge in edges if edge for t in edge]
+        edge_vectors = dict(zip(edge_texts, embed_cached(edge_texts))) if edge_texts else {}
+        
+        for (section, _), text, result, edge in zip(batch, texts, results, edges):
+            boundary = None
+            if edge is not None and previous_last is not None:
+                boundary = cosine(previous_last, edge_vectors[edge[0]])
+            previous_last = edge_vectors[edge[1]] if edge is not None else None
+            
+            yield from stats.add(index, section, text, result, boundary)
+            event = {
+                "event": "paragraph",
+                "index": index,
+                "section": section,
+                "score": result["score"],
+                "breakdown": result["breakdown"],
+                "max_similarity": result.get("novelty_details", {}).get("max_similarity"),
+                "boundary_coherence": round(boundary * 100, 1) if boundary is not None else None,
+                "text": preview(text)
+            }
+            if detail:
+                event["sentences"] = result["sentences"]
+            yield event
+            index += 1
+    yield from stats.finish()
+
+@app.route("/analyze-document", methods=["POST", "OPTIONS"])
+def analyze_document():
+    """
+    Stream the analysis of an uploaded manuscript as NDJSON (or SSE).
+    
+    Send the file as multipart field ``file`` or as the raw request body
+    (text or Markdown); pass ``problem`` as a form field or query parameter.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+    
+    try:
+        batch_size = int(request.args.get("batch_size", MANUSCRIPT_BATCH_SIZE))
+    except ValueError:
+        return jsonify({"error": "batch_size must be an integer"}), 400
+    batch_size = max(1, min(batch_size, MAX_BATCH_PARAGRAPHS))
+    problem = clean(request.values.get("problem", "research problem"))
+    upload = request.files.get("file")
+    if upload is not None:
+        # Werkzeug closes uploaded files when the view returns, before the
+        # streamed body is generated; keep the spooled file to ourselves.
+        lines, upload.stream = upload.stream, io.BytesIO()
+    else:
+        lines = request.stream
+    detail = request.args.get("detail", "").lower() in ("1", "true", "yes")
+    sse = request.args.get("stream") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+    
+    def events():
+        try:
+            yield from iter_manuscript_events(lines, problem, batch_size, detail)
+        finally:
+            lines.close()
+    return stream_events(events(), sse)
+
+@app.route("/history/<session_id>", methods=["GET", "DELETE", "OPTIONS"])
+def paragraph_history(session_id):
+    """Export (GET) or clear (DELETE) the paragraph history of one session."""
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+    
+    if request.method == "DELETE":
+        return jsonify({"session_id": session_id, "cleared": PARAGRAPH_HISTORY.clear(session_id)})
+    
+    include_embeddings = request.args.get("embeddings", "").lower() in ("1", "true", "yes")
+    paragraphs = PARAGRAPH_HISTORY.export(session_id, include_embeddings=include_embeddings)
+    return jsonify({
+        "session_id": session_id,
+        "paragraphs": paragraphs,
+        "count": len(paragraphs)
     })
 
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: 200 once the model is loaded, 503 (and start loading) before that."""
+    if _model is not None:
+        return jsonify({"ready": True, "model": _model_state})
+    if _model_state["status"] != "loading":
+        start_background_load()
+    return jsonify({"ready": False, "model": _model_state}), 503
+
+@app.route("/warmup", methods=["POST"])
+def warmup_route():
+    """Load and warm the model synchronously; returns how long it took."""
+    start = time.perf_counter()
+    warmup()
+    return jsonify({"ready": True, "seconds": round(time.perf_counter() - start, 3), "model": _model_state})
+
+REQUEST_SECONDS = metrics.histogram("request_seconds", "Request duration by endpoint and status")
+metrics.gauge("paper_cache_entries", "Problems in the paper cache", lambda: len(PAPER_CACHE))
+metrics.gauge("paper_cache_bytes", "Serialized size of the paper cache", lambda: PAPER_CACHE.size_bytes)
+metrics.gauge("sessions", "Sessions with paragraph history", lambda: len(PARAGRAPH_HISTORY))
+metrics.gauge("lexical_index_papers", "Papers in the lexical index", lambda: len(LEXICAL_INDEX or ()))
+metrics.gauge("problem_index_entries", "Problems in the semantic paper-cache index",
+              lambda: len(_problem_index or ()))
+metrics.gauge("model_loaded", "1 once the embedding model is loaded", lambda: _model is not None)
+if EMBED_SCHEDULER is not None:
+    metrics.gauge("embed_queue_depth", "Texts waiting for the embedding scheduler",
+                  lambda: EMBED_SCHEDULER.stats()["queue_depth"])
+
+@app.before_request
+def start_timing():
+    if metrics.ENABLED:
+        g.request_start = time.perf_counter()
+        metrics.start_request()
+
+@app.after_request
+def record_timing(response):
+    """Record the request duration and add a Server-Timing header with the stage timings."""
+    start = g.get("request_start")
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    REQUEST_SECONDS.observe(total, endpoint=request.endpoint or "unknown", status=response.status_code)
+    timings = metrics.request_timings()
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
+# Finished text responses of at least this many bytes are gzip/brotli encoded; 0 turns it off.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+
+@app.after_request
+def compress_response(response):
+    if (not COMPRESS_MIN_BYTES or response.direct_passthrough or response.is_streamed
+            or not compression.compressible(response)):
+        return response
+    return compression.encode(response, response.get_data(), request.headers.get("Accept-Encoding", ""),
+                              COMPRESS_MIN_BYTES)
+
+@app.route("/metrics")
+def metrics_route():
+    """Counters and histograms in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/stats")
+def stats():
+    """Cache and embedding-scheduler counters as JSON."""
+    return jsonify({
+        "embedding_scheduler": EMBED_SCHEDULER.stats() if EMBED_SCHEDULER is not None else None,
+        "paper_cache": {"entries": len(PAPER_CACHE), "bytes": PAPER_CACHE.size_bytes},
+        "segment_cache": {"entries": len(SEGMENT_CACHE), "chars": SEGMENT_CACHE.chars,
+                          "hits": SEGMENT_CACHE.hits, "misses": SEGMENT_CACHE.misses},
+        "embedding_precision": EMBEDDING_PRECISION,
+        "lexical_index": {"mode": LEXICAL_MODE, "papers": len(LEXICAL_INDEX or ())},
+        "problem_index": _problem_index.stats() if _problem_index is not None else None,
+        "sessions": len(PARAGRAPH_HISTORY),
+        "revisions": REVISIONS.stats()
+    })
+
+EDITOR_MAX_AGE = int(os.environ.get("EDITOR_MAX_AGE", "3600"))
+
 @app.route("/editor")
 def editor():
-    return """
+    """The built-in editor page, cacheable for EDITOR_MAX_AGE seconds and revalidated by ETag."""
+    response = Response(editor_html(), mimetype="text/html")
+    response.cache_control.public = True
+    response.cache_control.max_age = EDITOR_MAX_AGE
+    response.add_etag()
+    return response.make_conditional(request)
+
+def editor_html() -> str:
+    return r"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -503,7 +1836,7 @@ body {
 <p><b>Research Problem</b></p>
 <input id="problem" style="width:100%;padding:8px"
  value="Impact of bee population decline on food security"/>
-<button onclick="analyze()" style="margin-top:10px;padding:8px 15px;background:#0a7;color:white;border:none;border-radius:4px;cursor:pointer;">Analyze & Fetch Papers</button>
+<button onclick="clearTimeout(timer); clearTimeout(idleTimer); analyze(false, 'full')" style="margin-top:10px;padding:8px 15px;background:#0a7;color:white;border:none;border-radius:4px;cursor:pointer;">Analyze & Fetch Papers</button>
 
 <p><b>Write your paragraph</b></p>
 <div id="editor" class="editor" contenteditable="true">
@@ -518,42 +1851,119 @@ The global decline in bee populations poses a significant threat to food securit
 
 <script>
 let timer = null;
+let idleTimer = null;
+const sessionId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random();
 const editor = document.getElementById("editor");
 const tooltip = document.getElementById("tooltip");
 
+// Paper list of the last response; the server sends only ids while it is unchanged.
+let paperSet = null;
+let paperList = [];
+// Each analysis gets the next revision; the server drops work for older ones.
+let revision = 0;
+let inFlight = null;
+
+// While typing: the cheap live tier after a short pause; once idle, the full
+// tier, which also re-compares the paragraph with the papers.
 editor.addEventListener("input", () => {
   clearTimeout(timer);
-  timer = setTimeout(analyze, 1000);
+  clearTimeout(idleTimer);
+  timer = setTimeout(() => analyze(true, "live"), 300);
+  idleTimer = setTimeout(() => analyze(true, "full"), 2000);
 });
 
-async function analyze() {
+async function analyze(incremental, tier) {
   const problemInput = document.getElementById("problem").value;
   const scoreDiv = document.getElementById("score");
   const breakdownDiv = document.getElementById("breakdown");
   const papersInfoDiv = document.getElementById("papers-info");
   const papersListDiv = document.getElementById("papers-list");
+  const mine = ++revision;
+  if (inFlight) inFlight.abort();
+  const controller = inFlight = new AbortController();
   
-  scoreDiv.innerText = "Analyzing...";
-  scoreDiv.className = "score loading";
-  breakdownDiv.style.display = "none";
-  papersInfoDiv.innerText = "";
-  papersListDiv.style.display = "none";
-  papersListDiv.innerHTML = "";
+  if (tier !== "live") {
+    scoreDiv.innerText = "Analyzing...";
+    scoreDiv.className = "score loading";
+    breakdownDiv.style.display = "none";
+    papersInfoDiv.innerText = "";
+    papersListDiv.style.display = "none";
+    papersListDiv.innerHTML = "";
+  }
   
-  const res = await fetch("/score", {
-    method: "POST",
-    headers: {"Content-Type": "application/json"},
-    body: JSON.stringify({
-      paragraph: editor.innerText,
-      problem: problemInput
-    })
-  });
+  const sentText = editor.innerText;
+  let res;
+  try {
+    res = await fetch("/score", {
+      method: "POST",
+      headers: {"Content-Type": "application/json"},
+      signal: controller.signal,
+      body: JSON.stringify({
+        paragraph: sentText,
+        problem: problemInput,
+        session_id: sessionId,
+        revision: mine,
+        tier: tier || "full",
+        incremental: incremental === true,
+        paper_set: paperSet,
+        stream: true
+      })
+    });
+  } catch (err) {
+    if (err.name === "AbortError") return;
+    throw err;
+  }
+  if (res.status === 409) return;  // superseded by a newer revision
+
+  // NDJSON stream: papers first, then the score, then one event per sentence.
+  const sentences = [];
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  while (true) {
+    let chunk;
+    try {
+      chunk = await reader.read();
+    } catch (err) {
+      if (err.name === "AbortError") return;
+      throw err;
+    }
+    const { value, done } = chunk;
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split("\n");
+    buffered = lines.pop();
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event = JSON.parse(line);
+      if (event.event === "superseded" || mine !== revision) return;
+      if (event.event === "papers") {
+        if (event.papers) {
+          paperSet = event.paper_set;
+          paperList = event.papers;
+        }
+        renderPapers(paperList, event.papers_count);
+      } else if (event.event === "score") {
+        renderScore(event);
+      } else if (event.event === "sentence") {
+        sentences.push(event);
+      }
+    }
+  }
+
+  highlight(sentences, sentText);
+}
 
-  const data = await res.json();
-  scoreDiv.innerText = "Research Score: " + data.score + "/100";
+function renderScore(data) {
+  const scoreDiv = document.getElementById("score");
+  const breakdownDiv = document.getElementById("breakdown");
+  const papersInfoDiv = document.getElementById("papers-info");
+  
+  // Live scores reuse novelty and relevance from the last full analysis.
+  scoreDiv.innerText = "Research Score: " + data.score + "/100" + (data.tier === "live" ? " (live)" : "");
   scoreDiv.className = "score";
   
-  if (data.breakdown) {
+  if (data.breakdown && Object.keys(data.breakdown).length > 0) {
     const b = data.breakdown;
     breakdownDiv.innerHTML = `
       <div class="breakdown-item">
@@ -576,29 +1986,29 @@ async function analyze() {
     breakdownDiv.style.display = "block";
   }
   
-  console.log("Full response data:", data);
-  console.log("Papers data:", data.papers, "Type:", typeof data.papers, "Is Array:", Array.isArray(data.papers));
-  console.log("Papers count:", data.papers_count);
-  
-  const papers = data.papers;
-  const papersCount = data.papers_count || (papers ? papers.length : 0);
+  if (data.novelty_details && data.novelty_details.similar_papers && data.novelty_details.similar_papers.length > 0) {
+    const similarPapers = data.novelty_details.similar_papers.slice(0, 2);
+    papersInfoDiv.innerText += ` | Most similar: ${similarPapers.map(p => (p.title || "").substring(0, 40)).join(", ")}`;
+  }
+}
+
+function escapeHtml(text) {
+  if (!text) return "";
+  const div = document.createElement("div");
+  div.textContent = String(text);
+  return div.innerHTML;
+}
+
+function renderPapers(papers, papersCount) {
+  const papersInfoDiv = document.getElementById("papers-info");
+  const papersListDiv = document.getElementById("papers-list");
+  papersCount = papersCount || (papers ? papers.length : 0);
   
   if (papers && papers.length > 0) {
     papersInfoDiv.innerText = `Compared with ${papersCount} research papers`;
-    if (data.novelty_details && data.novelty_details.similar_papers && data.novelty_details.similar_papers.length > 0) {
-      const similarPapers = data.novelty_details.similar_papers.slice(0, 2);
-      papersInfoDiv.innerText += ` | Most similar: ${similarPapers.map(p => (p.title || "").substring(0, 40)).join(", ")}`;
-    }
     
     let papersHTML = '<h3>📚 Fetched Research Papers (' + papers.length + ')</h3>';
     
-    function escapeHtml(text) {
-      if (!text) return "";
-      const div = document.createElement("div");
-      div.textContent = String(text);
-      return div.innerHTML;
-    }
-    
     papers.forEach((paper, index) => {
       const title = escapeHtml(paper.title || "Untitled");
       let authors = "Unknown authors";
@@ -628,14 +2038,11 @@ async function analyze() {
     
     papersListDiv.innerHTML = papersHTML;
     papersListDiv.style.display = "block";
-    console.log("Papers displayed successfully");
   } else {
     papersInfoDiv.innerText = "No research papers found for this problem. Check console for details.";
     papersListDiv.style.display = "none";
     console.log("No papers to display. Papers:", papers, "Type:", typeof papers);
   }
-
-  highlight(data.sentences);
 }
 
 function toggleAbstract(abstractId) {
@@ -650,33 +2057,39 @@ function toggleAbstract(abstractId) {
   }
 }
 
-function highlight(sentences) {
-  let text = editor.innerText;
-  let html = text;
+// Wrap sentences with issues using the offsets from /score: one pass over the
+// text, and repeated sentences are told apart. Offsets refer to the text as
+// sent (the server trims it), so results for text edited since are skipped.
+function highlight(sentences, sentText) {
+  const text = editor.innerText;
+  if (text !== sentText) return;
+  const shift = text.length - text.trimStart().length;
+  let html = "";
+  let cursor = 0;
 
   sentences.forEach(s => {
     if (!s.issues || !s.issues.length) return;
+    let start = typeof s.start === "number" ? s.start + shift : -1;
+    if (text.slice(start, start + s.sentence.length) !== s.sentence) {
+      start = text.indexOf(s.sentence, cursor);
+    }
+    if (start < cursor) return;
+    const end = start + s.sentence.length;
 
-    const escaped = s.sentence.replace(/[.*+?^${}()|[\]\\]/g, "\\$&");
-    
-    const tooltipHTML = s.issues.map(i => {
-      const reason = (i.reason || "Issue detected").replace(/"/g, '&quot;');
-      const suggestion = (i.suggestion || "Review this sentence").replace(/"/g, '&quot;');
-      return `
+    const tooltipHTML = s.issues.map(i => `
         <div class="issue-item">
-          <div class="issue-reason">❌ ${reason}</div>
-          <div class="issue-suggestion">💡 ${suggestion}</div>
+          <div class="issue-reason">❌ ${escapeHtml(i.reason || "Issue detected")}</div>
+          <div class="issue-suggestion">💡 ${escapeHtml(i.suggestion || "Review this sentence")}</div>
         </div>
-      `;
-    }).join("");
+      `).join("").replace(/\s+/g, " ").trim();
 
-    html = html.replace(
-      new RegExp(escaped, "g"),
-      `<span class="issue" data-tooltip="${tooltipHTML.replace(/\n/g, ' ').replace(/\s+/g, ' ').trim()}">${s.sentence}</span>`
-    );
+    html += escapeHtml(text.slice(cursor, start)) +
+      `<span class="issue" data-tooltip="${escapeHtml(tooltipHTML).replace(/"/g, "&quot;")}">` +
+      `${escapeHtml(text.slice(start, end))}</span>`;
+    cursor = end;
   });
 
-  editor.innerHTML = html;
+  editor.innerHTML = html + escapeHtml(text.slice(cursor));
   attachTooltips();
 }
 
@@ -727,5 +2140,14 @@ function updateTooltipPosition(e) {
 </html>
 """
 
+MODEL_LOAD = os.environ.get("MODEL_LOAD", "lazy").lower()
+if MODEL_LOAD == "eager":
+    get_model()
+elif MODEL_LOAD == "background":
+    start_background_load()
+
 if __name__ == "__main__":
+    # With the debug reloader only the serving child process should load the model.
+    if MODEL_LOAD == "lazy" and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_load()
     app.run(debug=True, host="127.0.0.1", port=5001)
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+Async serving mode: /score, /test-papers, /papers and /editor on Quart.
+
+Live-assist requests spend most of their time waiting on Semantic Scholar.
+With the threaded Flask server each wait holds a worker thread for up to the
+request timeout; here paper searches are awaited on an ``httpx.AsyncClient``,
+so one process can keep hundreds of such requests in flight. CPU-bound work
+(embedding, scoring, sentence analysis) runs on a bounded thread pool of
+ASYNC_CPU_WORKERS threads, and everything else -- caches, indexes, scoring
+code -- is shared with app.py, whose shared state is guarded by locks.
+
+Usage:
+    pip install -r requirements.txt -r requirements-serve.txt
+    hypercorn async_app:app --bind 127.0.0.1:5001
+    python async_app.py
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, Response, g, jsonify, request
+
+import app as core
+import compression
+import metrics
+from scholar_client import AsyncSemanticScholarClient, AsyncSingleFlight
+
+CPU_WORKERS = int(os.environ.get("ASYNC_CPU_WORKERS", str(min(8, os.cpu_count() or 4))))
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+PAPER_FLIGHTS = AsyncSingleFlight()
+SCHOLAR_CLIENT = None  # created on the serving event loop
+_cpu_pending = 0
+
+app = Quart(__name__)
+
+metrics.gauge("async_cpu_pending", "Calls queued or running on the async server's CPU pool",
+              lambda: _cpu_pending)
+
+
+async def run_cpu(fn, *args):
+    """Run ``fn(*args)`` on the CPU pool in the caller's context (so stage timings reach the request)."""
+    global _cpu_pending
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    _cpu_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(CPU_EXECUTOR, call)
+    finally:
+        _cpu_pending -= 1
+
+
+async def search_papers(problem: str, limit: int = 10):
+    """core.search_papers with the HTTP call awaited."""
+    search_query = core.extract_key_terms(problem)
+    with core.scholar_search(search_query):
+        data = await SCHOLAR_CLIENT.search(search_query, limit)
+    return core.parse_papers(data, search_query)
+
+
+async def fetch_research_papers(problem: str, limit: int = 10):
+    """core.fetch_research_papers: same paper cache, problem index and single-flight, without blocking."""
+    with metrics.stage("papers"):
+        key, query, vector = await run_cpu(core.paper_cache_key, problem)
+
+        async def load():
+            return await run_cpu(core.index_papers, await search_papers(query, limit))
+
+        papers = await PAPER_FLIGHTS.do(key, lambda: core.PAPER_CACHE.get_or_fetch_async(key, load))
+        await run_cpu(core.remember_problem, problem, key, vector, papers)
+    return papers
+
+
+async def find_papers(problem: str, limit: int = 10):
+    """core.find_papers: local candidates first, Semantic Scholar only when they do not suffice."""
+    local, answer = await run_cpu(core.local_papers, problem, limit)
+    if answer is not None:
+        return answer
+    remote = await fetch_research_papers(problem, limit)
+    return await run_cpu(core.combine_papers, problem, local, remote, limit)
+
+
+@app.before_serving
+async def start():
+    global SCHOLAR_CLIENT
+    SCHOLAR_CLIENT = AsyncSemanticScholarClient(**core.SCHOLAR_SETTINGS, limiter=core.SCHOLAR_CLIENT.limiter)
+    if core._model is None and core._model_state["status"] != "loading":
+        core.start_background_load()
+
+
+@app.after_serving
+async def stop():
+    await SCHOLAR_CLIENT.aclose()
+    CPU_EXECUTOR.shutdown(wait=False)
+
+
+@app.before_request
+async def start_timing():
+    if metrics.ENABLED:
+        g.request_start = time.perf_counter()
+        metrics.start_request()
+
+
+@app.after_request
+async def finish_response(response):
+    """CORS headers as flask-cors sets them for app.py, compression, request timing and Server-Timing."""
+    origin = request.headers.get("Origin")
+    if origin in core.CORS_SETTINGS["origins"]:
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Access-Control-Allow-Methods"] = ", ".join(core.CORS_SETTINGS["methods"])
+        response.headers["Access-Control-Allow-Headers"] = ", ".join(core.CORS_SETTINGS["allow_headers"])
+        response.headers["Vary"] = "Origin"
+    if (core.COMPRESS_MIN_BYTES and isinstance(response.response, response.data_body_class)
+            and compression.compressible(response)):
+        compression.encode(response, await response.get_data(), request.headers.get("Accept-Encoding", ""),
+                           core.COMPRESS_MIN_BYTES)
+    start = g.get("request_start")
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    core.REQUEST_SECONDS.observe(total, endpoint=request.endpoint or "unknown", status=response.status_code)
+    timings = metrics.request_timings()
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
+
+@app.route("/test-papers", methods=["GET", "OPTIONS"])
+async def test_papers():
+    """Endpoint for live assist mode to fetch research papers."""
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    problem = request.args.get("problem", "").strip()
+    if not problem:
+        return jsonify({"error": "Problem parameter is required"}), 400
+
+    papers = await find_papers(problem, limit=10)
+    return await paper_set_response(*core.register_paper_set(papers))
+
+
+async def paper_set_response(set_id, papers):
+    """core.paper_set_response: the paper list with its set id as ETag, or a 304."""
+    response = jsonify({
+        "paper_set": set_id,
+        "papers": papers,
+        "papers_count": len(papers)
+    })
+    response.set_etag(set_id)
+    response.cache_control.no_cache = True
+    return await response.make_conditional(request)
+
+
+@app.route("/papers/<set_id>", methods=["GET", "OPTIONS"])
+async def paper_set(set_id):
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+    papers = core.PAPER_SETS.get(set_id)
+    if papers is None:
+        return jsonify({"error": "Unknown or expired paper set"}), 404
+    response = await paper_set_response(set_id, papers)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route("/score", methods=["POST", "OPTIONS"])
+async def score():
+    if request.method == "OPTIONS":
+        return jsonify({}), 200
+
+    data = await request.get_json(silent=True) or {}
+    paragraph = core.clean(data.get("paragraph"))
+    problem = core.clean(data.get("problem", "research problem"))
+    session_id = core.get_session_id(data, request)
+    incremental = bool(data.get("incremental"))
+    known_set = data.get("paper_set")
+    revision = core.get_revision(data)
+    tier = str(data.get("tier") or "full").lower()
+    if tier not in core.TIERS:
+        return jsonify({"error": "tier must be 'live' or 'full'"}), 400
+    core.REVISIONS.begin(session_id, revision)
+    full = core.live_base(paragraph, problem, session_id, tier)
+
+    stream = data.get("stream") or request.args.get("stream")
+    sse = stream == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+    research_papers = None
+    if full is None:
+        try:
+            core.REVISIONS.check(session_id, revision, "papers")
+            research_papers = await find_papers(problem)
+        except core.Superseded as error:
+            if not stream:
+                raise
+            return stream_events(iter([{"event": "superseded", **core.superseded_fields(error)}]), sse)
+    if stream:
+        events = core.iter_score_events(paragraph, problem, session_id, incremental, research_papers, known_set,
+                                        revision, full)
+        return stream_events(events, sse)
+    result = await run_cpu(core.score_response, paragraph, problem, research_papers, session_id, incremental,
+                           known_set, revision, full)
+    return jsonify(result)
+
+
+@app.errorhandler(core.Superseded)
+async def superseded(error):
+    return jsonify(core.superseded_fields(error)), 409
+
+
+def stream_events(events, sse=False):
+    """core.stream_events for Quart: each event is computed on the CPU pool, then sent."""
+    async def generate():
+        while True:
+            event = await run_cpu(next, events, None)
+            if event is None:
+                return
+            payload = json.dumps(event)
+            if sse:
+                yield f"event: {event['event']}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+
+    mimetype = "text/event-stream" if sse else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route("/editor")
+async def editor():
+    response = Response(core.editor_html(), mimetype="text/html")
+    response.cache_control.public = True
+    response.cache_control.max_age = core.EDITOR_MAX_AGE
+    await response.add_etag()
+    return await response.make_conditional(request)
+
+
+@app.route("/healthz")
+async def healthz():
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+async def readyz():
+    if core._model is not None:
+        return jsonify({"ready": True, "model": core._model_state})
+    if core._model_state["status"] != "loading":
+        core.start_background_load()
+    return jsonify({"ready": False, "model": core._model_state}), 503
+
+
+@app.route("/metrics")
+async def metrics_route():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=5001)
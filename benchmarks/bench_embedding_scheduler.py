@@ -0,0 +1,86 @@
+"""
+Throughput of concurrent /score requests with and without cross-request batching.
+
+Usage:
+    python benchmarks/bench_embedding_scheduler.py [--concurrency 50] [--requests 200]
+
+Each worker thread posts paragraphs to the Flask test client. Papers come from
+the local stub (benchmarks/stub_scholar.py), so only embedding and scoring
+cost is measured. Run it once with EMBED_BATCHING=1 (the default) and once
+with EMBED_BATCHING=0, then compare. Each run gets its own empty CACHE_DIR and
+every paragraph's sentences are unique, so neither run is served by the
+other's paper cache, embedding store or sentence cache.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import stub_scholar  # noqa: E402
+
+_, STUB_URL = stub_scholar.start()
+os.environ.setdefault("SEMANTIC_SCHOLAR_URL", STUB_URL)
+os.environ.setdefault("SCHOLAR_RATE", "1000")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-scheduler-")
+
+import app  # noqa: E402
+
+
+def paragraph(i):
+    return (f"Draft {i}: declining pollinator populations threaten crop yields. "
+            f"Field survey {i} links pesticide exposure to colony losses. "
+            f"Model {i} projects the effect on regional food security over several seasons.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    client = app.app.test_client()
+    problem = "Impact of bee population decline on food security"
+    # Warm up (model, papers) with a paragraph the timed requests never reuse.
+    client.post("/score", json={"paragraph": paragraph(-1), "problem": problem})
+
+    counter = iter(range(args.requests))
+    lock = threading.Lock()
+    latencies = []
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            client.post("/score", json={"paragraph": paragraph(i), "problem": problem, "session_id": f"s{i}"})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    mode = "batched" if app.EMBED_SCHEDULER is not None else "direct"
+    print(f"{mode}: {args.requests} requests, concurrency {args.concurrency}")
+    print(f"  throughput {args.requests / elapsed:.1f} req/s")
+    print(f"  p50 {latencies[len(latencies) // 2] * 1000:.1f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+    if app.EMBED_SCHEDULER is not None:
+        print(f"  scheduler {app.EMBED_SCHEDULER.stats()}")
+
+
+if __name__ == "__main__":
+    main()
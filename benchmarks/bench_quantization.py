@@ -0,0 +1,116 @@
+"""
+Accuracy drift, memory and similarity latency of the embedding precisions.
+
+Usage:
+    python benchmarks/bench_quantization.py [--rows 20000] [--queries 200] [--model]
+
+For each precision in quantize.PRECISIONS the paper rows are quantized and
+compared against float32:
+
+    cosine drift   |cos_q - cos_f32| over every (query, row) pair
+    score drift    |score_q - score_f32| of score_from_embeddings, in points
+    bytes/vector   codes plus scale
+    latency        similarities() of one query against all rows
+
+By default the vectors are synthetic (clustered unit vectors with the model's
+dimension). ``--model`` embeds generated abstracts with the real model instead.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import app  # noqa: E402
+from quantize import PRECISIONS, quantize, similarities  # noqa: E402
+from stub_scholar import synthetic_response  # noqa: E402
+
+
+def normalize(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_vectors(n, dim, topics, rng):
+    """Unit vectors scattered around ``topics`` random directions, like abstracts on a few subjects."""
+    centers = normalize(rng.standard_normal((topics, dim)))
+    rows = centers[rng.integers(0, topics, n)] + 0.08 * rng.standard_normal((n, dim))
+    return normalize(rows)
+
+
+def model_vectors(n):
+    texts = []
+    query = 0
+    while len(texts) < n:
+        data = synthetic_response(f"pollinator topic {query}", 100)["data"]
+        texts.extend(f"{p['title']}. {p['abstract']}" for p in data)
+        query += 1
+    return app.embed_many(texts[:n])
+
+
+def score_drift(rows, queries, precision, papers_per_query=10):
+    """Score every query paragraph against a slice of papers in float32 and in ``precision``."""
+    codes, scales = quantize(rows, precision)
+    drifts = []
+    for i, query in enumerate(queries):
+        start = (i * papers_per_query) % (len(rows) - papers_per_query)
+        sl = slice(start, start + papers_per_query)
+        papers = [{"title": f"Paper {j}"} for j in range(papers_per_query)]
+        text_embs = np.vstack([query, queries[(i + 1) % len(queries)], queries[(i + 2) % len(queries)]])
+        ones = np.ones(papers_per_query, dtype=np.float32)
+        offsets = np.arange(papers_per_query)
+        exact = app.score_from_embeddings(text_embs, (rows[sl], ones, offsets), papers)
+        approx = app.score_from_embeddings(text_embs, (codes[sl], scales[sl], offsets), papers)
+        drifts.append(abs(exact["score"] - approx["score"]))
+    return drifts
+
+
+def time_similarities(codes, scales, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries[:20]:
+            start = time.perf_counter()
+            similarities(codes, scales, query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384, help="Vector size for synthetic data")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--model", action="store_true", help="Embed generated abstracts with the real model")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.model:
+        vectors = model_vectors(args.rows + args.queries)
+    else:
+        vectors = synthetic_vectors(args.rows + args.queries, args.dim, topics=50, rng=rng)
+    rows, queries = vectors[:args.rows], vectors[args.rows:]
+    exact = queries @ rows.T
+
+    print(f"rows={len(rows)} queries={len(queries)} dim={rows.shape[1]} source={'model' if args.model else 'synthetic'}")
+    print(f"{'precision':>9}  {'bytes/vec':>9}  {'store MB':>8}  {'cos drift mean':>14}  {'max':>8}  "
+          f"{'score drift mean':>16}  {'max':>5}  {'median ms':>9}")
+    for precision in PRECISIONS:
+        codes, scales = quantize(rows, precision)
+        approx = np.stack([similarities(codes, scales, q) for q in queries])
+        cos_drift = np.abs(approx - exact)
+        drifts = score_drift(rows, queries, precision)
+        per_vector = codes.itemsize * codes.shape[1] + (scales.itemsize if precision == "int8" else 0)
+        latency = statistics.median(time_similarities(codes, scales, queries, args.repeat))
+        print(f"{precision:>9}  {per_vector:>9d}  {per_vector * len(rows) / 2 ** 20:>8.1f}  "
+              f"{cos_drift.mean():>14.2e}  {cos_drift.max():>8.2e}  "
+              f"{statistics.mean(drifts):>16.3f}  {max(drifts):>5.1f}  {latency:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Compare the per-text embedding path against the batched score_paragraph.
+
+Usage:
+    python benchmarks/bench_score_paragraph.py [--papers 10] [--sentences 8] [--runs 20]
+
+Papers are synthetic so the run needs no network access, only the model.
+Every timed run scores a fresh paragraph, problem and paper set, and
+CACHE_DIR points at a new temporary directory, so neither path is served by
+the embedding store, the sentence cache or vectors attached to the papers
+by an earlier run: the batched numbers measure batching, not cache hits.
+EMBED_BATCHING is turned off, so the legacy path's one-text encode calls
+do not each wait out the embedding scheduler's batching window.
+
+The legacy path makes one encode call per text. The batched path makes two:
+one for the paragraph, problem and sentences, and one for the paper chunks.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-score-")
+os.environ["EMBED_BATCHING"] = "0"
+
+import app  # noqa: E402
+from app import cosine, embed, sent_tokenize  # noqa: E402
+
+
+def legacy_score(paragraph, problem, research_papers):
+    """The pre-batching scoring loop: one encode call per text, papers encoded twice."""
+    para_emb = embed(paragraph)
+    prob_emb = embed(problem)
+    sims = [cosine(para_emb, embed(p["text"][:1000])) for p in research_papers]
+    novelty = 1 - max(sims) if sims else 1.0
+    alignment = cosine(para_emb, prob_emb)
+    sent_embs = [embed(s) for s in sent_tokenize(paragraph)]
+    coherence = 1.0
+    if len(sent_embs) > 1:
+        pairs = [cosine(sent_embs[i], sent_embs[i + 1]) for i in range(len(sent_embs) - 1)]
+        coherence = sum(pairs) / len(pairs)
+    paper_embs = [embed(p["text"][:1000]) for p in research_papers]
+    rel = [cosine(para_emb, e) for e in paper_embs]
+    relevance = sum(rel) / len(rel) if rel else 0.5
+    return 0.25 * (novelty + alignment + coherence + relevance)
+
+
+def make_inputs(n_papers, n_sentences, run):
+    """Inputs no earlier run has seen: every text carries the run number."""
+    paragraph = " ".join(
+        f"Declining bee populations in study {run}.{i} reduce pollination services for crops "
+        f"that supply a large share of dietary micronutrients." for i in range(n_sentences)
+    )
+    papers = []
+    for i in range(n_papers):
+        text = f"Paper {run}.{i} on pollinator loss. " + " ".join(
+            f"Finding {j} relates habitat, pesticides and yield in region {run}.{i}." for j in range(12)
+        )
+        papers.append({"title": f"Paper {run}.{i}", "text": text})
+    return paragraph, f"Impact of bee population decline on food security (case {run})", papers
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def time_runs(fn, runs, n_papers, n_sentences, first):
+    """Latency in ms of ``fn(paragraph, problem, papers)``, on new inputs each run."""
+    samples = []
+    for run in range(first, first + runs):
+        inputs = make_inputs(n_papers, n_sentences, run)
+        start = time.perf_counter()
+        fn(*inputs)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def count_encodes(fn):
+    calls = []
+    model = app.get_model()
+    original = model.encode
+
+    def counting_encode(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    model.encode = counting_encode
+    try:
+        fn()
+    finally:
+        model.encode = original
+    return len(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--sentences", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = {
+        "legacy": legacy_score,
+        "batched": lambda paragraph, problem, papers: app.score_paragraph(paragraph, problem, papers),
+    }
+    # Load the model and warm up torch on inputs the timed runs never reuse.
+    for fn in paths.values():
+        fn(*make_inputs(args.papers, args.sentences, -1))
+
+    print(f"papers={args.papers} sentences={args.sentences} runs={args.runs} cache_dir={app.CACHE_DIR}")
+    p50s = {}
+    for n, (name, fn) in enumerate(paths.items()):
+        first = (n + 1) * (args.runs + 1)
+        calls = count_encodes(lambda: fn(*make_inputs(args.papers, args.sentences, first - 1)))
+        samples = time_runs(fn, args.runs, args.papers, args.sentences, first)
+        p50s[name] = percentile(samples, 0.5)
+        print(f"{name:>8}: encode calls={calls:3d}  "
+              f"p50={p50s[name]:8.1f} ms  p95={percentile(samples, 0.95):8.1f} ms")
+    print(f"p50 speedup: {p50s['legacy'] / p50s['batched']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
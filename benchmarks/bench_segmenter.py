@@ -0,0 +1,133 @@
+"""
+Speed and accuracy of segmenter.py against the punkt path it replaces.
+
+Usage:
+    python benchmarks/bench_segmenter.py [--paragraphs 2000] [--repeat 3]
+
+Methods:
+    punkt        nltk.sent_tokenize, the previous default (needs punkt data,
+                 see "Sentence Segmentation" in the README; skipped without it)
+    regex        the punctuation split used by SEGMENTER=punkt without punkt data
+    segmenter    segmenter.spans, which also returns character offsets
+
+Speed is measured on generated academic paragraphs: the sentences of
+benchmarks/run.py, sentences full of citations and abbreviations, and stub
+paper abstracts. "per request" is the old /score cost, which segmented each
+paragraph twice (score_paragraph and analyze_sentences), against one
+segmenter pass. Accuracy is exact-match of the sentence list on a small
+hand-labelled set of academic sentences, and agreement with punkt on the
+generated paragraphs when punkt is available.
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import nltk  # noqa: E402
+
+import segmenter  # noqa: E402
+from run import SENTENCES  # noqa: E402
+from stub_scholar import synthetic_response  # noqa: E402
+
+nltk.data.path.insert(0, os.path.join(HERE, "..", "nltk_data"))
+
+ACADEMIC = (
+    "As reported by Smith et al. (2020), colony losses doubled.",
+    "See Fig. 2 and Eq. 4 for the full model.",
+    "Pesticides, e.g. neonicotinoids, were applied at approx. 40 sites.",
+    "The effect was significant (p < 0.05) in 12 of 15 regions [3].",
+    "J. Doe and M. Roe collected samples in the U.S. Midwest.",
+    "Yields fell by 3.5% per year, cf. Table 2.",
+    "Is pollinator loss the main driver?",
+    "Results differ between wild bees vs. honey bees.",
+)
+
+LABELLED = [
+    (" ".join(ACADEMIC[:3]), list(ACADEMIC[:3])),
+    (" ".join(ACADEMIC[3:6]), list(ACADEMIC[3:6])),
+    (" ".join(ACADEMIC[5:]), list(ACADEMIC[5:])),
+    ("We use the data of Doe et al. (2019). It covers 40 sites.",
+     ["We use the data of Doe et al. (2019).", "It covers 40 sites."]),
+    ("Declines were steep... Recovery was slow.", ["Declines were steep...", "Recovery was slow."]),
+    ("Sec. 3 describes methods. Sec. 4 gives results.", ["Sec. 3 describes methods.", "Sec. 4 gives results."]),
+    ("i.e. the first case. The second case differs.", ["i.e. the first case.", "The second case differs."]),
+    ("The sample (n = 120) was balanced. \"Surprising,\" the authors note.",
+     ["The sample (n = 120) was balanced.", "\"Surprising,\" the authors note."]),
+]
+
+# app._SENTENCE_END, copied so the benchmark does not import the app.
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+
+def regex_split(text):
+    return [s.strip() for s in SENTENCE_END.split(text.strip()) if s.strip()]
+
+
+def punkt_available():
+    for resource in ("tokenizers/punkt_tab/english/", "tokenizers/punkt"):
+        try:
+            nltk.data.find(resource)
+            return True
+        except LookupError:
+            continue
+    return False
+
+
+def paragraphs(n, rng):
+    abstracts = [p["abstract"] for p in synthetic_response("pollinator decline food security", 50)["data"]]
+    pool = list(SENTENCES) + list(ACADEMIC)
+    out = []
+    for i in range(n):
+        if i % 3 == 2:
+            out.append(rng.choice(abstracts))
+        else:
+            out.append(" ".join(rng.choice(pool) for _ in range(rng.randint(2, 12))))
+    return out
+
+
+def time_method(fn, texts, repeat):
+    best = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best.append((time.perf_counter() - start) / len(texts) * 1e6)
+    return min(best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = paragraphs(args.paragraphs, random.Random(0))
+    methods = {"regex": regex_split, "segmenter": segmenter.split}
+    if punkt_available():
+        methods = {"punkt": nltk.sent_tokenize, **methods}
+    else:
+        print("punkt data not found: punkt skipped (python -m nltk.downloader -d nltk_data punkt_tab punkt)")
+
+    chars = statistics.mean(len(t) for t in texts)
+    print(f"{len(texts)} paragraphs, {chars:.0f} characters on average")
+    print(f"{'method':>10}  {'us/paragraph':>12}  {'per request':>11}  {'labelled exact':>14}  {'agrees w/ punkt':>15}")
+    for name, fn in methods.items():
+        us = time_method(fn, texts, args.repeat)
+        # Before one pass per request, /score segmented each paragraph twice.
+        per_request = us if name == "segmenter" else 2 * us
+        exact = sum(fn(text) == gold for text, gold in LABELLED)
+        agree = "-"
+        if "punkt" in methods:
+            agree = f"{sum(fn(t) == nltk.sent_tokenize(t) for t in texts) / len(texts):.1%}"
+        print(f"{name:>10}  {us:>12.1f}  {per_request:>11.1f}  {exact:>8d}/{len(LABELLED):<5d}  {agree:>15}")
+
+
+if __name__ == "__main__":
+    main()
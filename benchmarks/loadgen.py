@@ -0,0 +1,371 @@
+"""
+Closed-loop load generator replaying editor typing sessions against a running server.
+
+Usage:
+    python benchmarks/loadgen.py [--sessions 1,4,16,32] [--duration 60] [--interval 1.0]
+                                 [--server CMD | --url URL [--pid PID]] [--scholar-latency-ms 200]
+                                 [--repeat-ratio 0.8] [--tier editor] [--json FILE]
+
+Every session behaves like one user of /editor:
+    1. pick a problem: with ``--repeat-ratio`` a popular one (Zipf-weighted
+       over a fixed list, so popular problems repeat across users), else a
+       new one nobody asked before
+    2. GET /test-papers for it, as live assist does
+    3. type a paragraph sentence by sentence, posting /score after each
+       sentence and waiting ``--interval`` seconds (the editor's debounce)
+       after every response before the next one
+    4. start over with a new session id
+
+The loop is closed: a session sends its next request only after the previous
+one returned, so offered load grows with ``--sessions``. Each comma-separated
+value of ``--sessions`` is one stage of ``--duration`` seconds. Throughput
+that stops growing from one stage to the next, with tail latency climbing,
+is where the server saturates.
+
+By default the server is started as a child process, with ``--server``
+(default: app.py on the threaded Werkzeug server), and pointed at an
+in-process stub Semantic Scholar (benchmarks/stub_scholar.py) with
+``--scholar-latency-ms`` of latency, using a temporary CACHE_DIR. To test
+e.g. gunicorn (from requirements-serve.txt)::
+
+    python benchmarks/loadgen.py --server "gunicorn -c gunicorn.conf.py app:app" --port 5001
+
+With ``--url`` an already running server is used instead (``--pid`` lets its
+CPU/RSS be sampled). Every ``--report-every`` seconds a line shows requests
+per second, p50/p95/p99 latency, error rate and the CPU and resident memory
+of the server process and its children (Linux /proc). A summary per stage
+follows at the end, and ``--json`` writes all of it.
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, HERE)
+
+import stub_scholar  # noqa: E402
+
+POPULAR_PROBLEMS = (
+    "Impact of bee population decline on food security",
+    "Effect of microplastics on freshwater fish health",
+    "Machine learning for early detection of sepsis",
+    "Urban heat islands and public health outcomes",
+    "Soil carbon sequestration in regenerative agriculture",
+    "Misinformation spread on social media during elections",
+    "Battery degradation in electric vehicles under fast charging",
+    "Remote work and employee productivity",
+    "Antibiotic resistance in hospital wastewater",
+    "Coral reef bleaching under ocean warming",
+    "Large language models for code review",
+    "Air pollution exposure and childhood asthma",
+)
+TOPICS = stub_scholar.VOCABULARY
+CONNECTIVES = ("Moreover,", "However,", "In contrast,", "As a result,", "Notably,", "We find that", "Prior work shows")
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+class Recorder:
+    """Request outcomes, bucketed per reporting interval and per stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.window = []
+        self.stage = []
+
+    def add(self, endpoint, seconds, ok):
+        with self.lock:
+            self.window.append((endpoint, seconds, ok))
+            self.stage.append((endpoint, seconds, ok))
+
+    def take(self, stage=False):
+        with self.lock:
+            if stage:
+                items, self.stage = self.stage, []
+            else:
+                items, self.window = self.window, []
+        return items
+
+
+def summarize(items, seconds):
+    latencies = [s * 1000 for endpoint, s, ok in items if ok and endpoint == "score"]
+    lookups = [s * 1000 for endpoint, s, ok in items if ok and endpoint == "test-papers"]
+    errors = sum(1 for _, _, ok in items if not ok)
+    return {
+        "requests": len(items),
+        "rps": round(len(items) / seconds, 2) if seconds else 0.0,
+        "error_rate": round(errors / len(items), 4) if items else 0.0,
+        "score_p50_ms": percentile(latencies, 0.50),
+        "score_p95_ms": percentile(latencies, 0.95),
+        "score_p99_ms": percentile(latencies, 0.99),
+        "papers_p95_ms": percentile(lookups, 0.95),
+    }
+
+
+class ProcessSampler:
+    """CPU and RSS of a process and all its descendants, from /proc (Linux only)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.tick = os.sysconf("SC_CLK_TCK")
+        self.page = os.sysconf("SC_PAGE_SIZE")
+        self.last = None
+
+    def _tree(self):
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        pids, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            pids.append(pid)
+            todo.extend(children.get(pid, ()))
+        return pids
+
+    def sample(self):
+        """``(cpu_percent, rss_mb)`` since the previous call; cpu is None on the first one."""
+        if self.pid is None or not os.path.isdir("/proc"):
+            return None, None
+        ticks, rss = 0, 0
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as f:
+                    rss += int(f.read().split()[1]) * self.page
+            except (OSError, IndexError, ValueError):
+                continue
+            ticks += int(fields[11]) + int(fields[12])  # utime + stime
+        now = time.monotonic()
+        cpu = None
+        if self.last is not None:
+            cpu = round(100 * (ticks - self.last[0]) / self.tick / (now - self.last[1]), 1)
+        self.last = (ticks, now)
+        return cpu, round(rss / 2 ** 20, 1)
+
+
+class Session(threading.Thread):
+    """One simulated editor user; runs until ``stop`` is set."""
+
+    def __init__(self, stage, index, args, recorder, stop):
+        super().__init__(daemon=True)
+        self.stage = stage
+        self.index = index
+        self.args = args
+        self.recorder = recorder
+        self.stop = stop
+        self.rng = random.Random((args.seed * 1009 + stage) * 100003 + index)
+        self.http = requests.Session()
+        self.http.trust_env = False  # never route the benchmark through a proxy
+        self.runs = 0
+
+    def problem(self):
+        if self.rng.random() < self.args.repeat_ratio:
+            weights = [1 / rank for rank in range(1, len(POPULAR_PROBLEMS) + 1)]
+            return self.rng.choices(POPULAR_PROBLEMS, weights)[0]
+        words = self.rng.sample(TOPICS, 3)
+        return f"Role of {words[0]} in {words[1]} {words[2]} ({self.stage}-{self.index}-{self.runs})"
+
+    def sentence(self, problem):
+        terms = [w for w in problem.lower().split() if len(w) > 3] or TOPICS
+        words = [self.rng.choice(terms + TOPICS) for _ in range(self.rng.randint(8, 18))]
+        if self.rng.random() < 0.3:
+            words.append(f"({self.rng.randint(2, 95)}%)")
+        return f"{self.rng.choice(CONNECTIVES)} {' '.join(words)}."
+
+    def request(self, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, url, timeout=self.args.timeout, **kwargs)
+            ok = response.status_code < 400
+            body = response.json() if ok and response.content else {}
+        except (requests.RequestException, ValueError):
+            ok, body = False, {}
+        self.recorder.add(endpoint, time.perf_counter() - start, ok)
+        return body
+
+    def tier(self, last):
+        if self.args.tier == "editor":
+            return "full" if last else "live"
+        return self.args.tier
+
+    def run(self):
+        while not self.stop.is_set():
+            self.runs += 1
+            problem = self.problem()
+            # Unique per run: the server remembers each session's latest revision.
+            session_id = f"load-{os.getpid()}-{self.stage}-{self.index}-{self.runs}"
+            self.request("test-papers", "GET", f"{self.args.url}/test-papers", params={"problem": problem})
+            sentences, paper_set = [], None
+            count = self.rng.randint(self.args.min_sentences, self.args.max_sentences)
+            for step in range(count):
+                if self.stop.wait(self.args.interval):
+                    return
+                sentences.append(self.sentence(problem))
+                body = self.request("score", "POST", f"{self.args.url}/score", json={
+                    "paragraph": " ".join(sentences),
+                    "problem": problem,
+                    "session_id": session_id,
+                    "revision": step + 1,
+                    "incremental": True,
+                    "tier": self.tier(step == count - 1),
+                    "paper_set": paper_set,
+                })
+                paper_set = body.get("paper_set", paper_set)
+
+
+def start_server(args):
+    """Start the server under test against the stub; returns the process."""
+    stub, stub_url = stub_scholar.start(latency_ms=args.scholar_latency_ms, error_rate=args.scholar_error_rate)
+    env = dict(os.environ)
+    env.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="loadgen-cache-"))
+    env.update(SEMANTIC_SCHOLAR_URL=stub_url, SCHOLAR_RATE=env.get("SCHOLAR_RATE", "1000"),
+               SCHOLAR_BURST=env.get("SCHOLAR_BURST", "1000"), BIND=f"127.0.0.1:{args.port}",
+               NO_PROXY="*")
+    command = args.server or (f"{shlex.quote(sys.executable)} -c "
+                              f"\"import app; app.app.run(host='127.0.0.1', port={args.port}, threaded=True)\"")
+    process = subprocess.Popen(command, shell=True, cwd=ROOT, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL if args.quiet_server else None,
+                               stderr=subprocess.DEVNULL if args.quiet_server else None)
+    process.stub = stub
+    return process
+
+
+def wait_ready(url, timeout):
+    """Poll /readyz (which also starts the model load) until the server can score."""
+    deadline = time.monotonic() + timeout
+    http = requests.Session()
+    http.trust_env = False
+    while time.monotonic() < deadline:
+        try:
+            if http.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"server at {url} not ready after {timeout}s")
+
+
+def run_stage(stage, sessions, args, sampler, report):
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [Session(stage, i, args, recorder, stop) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+        time.sleep(args.interval / max(1, sessions))  # spread first requests over one interval
+    start = last = time.monotonic()
+    sampler.sample()
+    samples = []
+    while time.monotonic() - start < args.duration:
+        time.sleep(max(0.0, min(args.report_every, args.duration - (time.monotonic() - start))))
+        now = time.monotonic()
+        cpu, rss = sampler.sample()
+        line = dict(summarize(recorder.take(), now - last), t=round(now - start, 1), sessions=sessions,
+                    cpu_percent=cpu, rss_mb=rss)
+        last = now
+        samples.append(line)
+        report(line)
+    stop.set()
+    elapsed = time.monotonic() - start
+    for thread in threads:
+        thread.join(args.timeout + args.interval)
+    summary = dict(summarize(recorder.take(stage=True), elapsed), sessions=sessions)
+    cpus = [s["cpu_percent"] for s in samples if s["cpu_percent"] is not None]
+    summary["cpu_percent_mean"] = round(sum(cpus) / len(cpus), 1) if cpus else None
+    summary["rss_mb_max"] = max((s["rss_mb"] for s in samples if s["rss_mb"] is not None), default=None)
+    return summary, samples
+
+
+def fmt(value, spec):
+    return format(value, spec) if value is not None else "-".rjust(int(spec.split(".")[0].lstrip(">") or 1))
+
+
+def print_line(line):
+    print(f"{line['t']:>6.1f}s  n={line['sessions']:<4d} {line['rps']:>7.1f} req/s  "
+          f"p50 {fmt(line['score_p50_ms'], '>7.0f')}  p95 {fmt(line['score_p95_ms'], '>7.0f')}  "
+          f"p99 {fmt(line['score_p99_ms'], '>7.0f')} ms  err {line['error_rate'] * 100:>5.1f}%  "
+          f"cpu {fmt(line['cpu_percent'], '>6.1f')}%  rss {fmt(line['rss_mb'], '>7.1f')} MB", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,4,16", help="Concurrent sessions per stage, comma-separated")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per stage")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between a response and the next edit")
+    parser.add_argument("--min-sentences", type=int, default=3)
+    parser.add_argument("--max-sentences", type=int, default=10)
+    parser.add_argument("--repeat-ratio", type=float, default=0.8,
+                        help="Share of sessions on a popular (repeated) problem")
+    parser.add_argument("--tier", choices=("editor", "live", "full"), default="editor",
+                        help="'editor' sends live requests and a full one when the paragraph is done")
+    parser.add_argument("--url", help="Use a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="Server process to sample with --url")
+    parser.add_argument("--server", help="Command starting the server (default: app.py on Werkzeug)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--scholar-latency-ms", type=float, default=200.0)
+    parser.add_argument("--scholar-error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write per-interval samples and stage summaries here")
+    parser.add_argument("--quiet-server", action="store_true", help="Discard the server's output")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        args.url = args.url.rstrip("/")
+        pid = args.pid
+    else:
+        process = start_server(args)
+        args.url = f"http://127.0.0.1:{args.port}"
+        pid = process.pid
+    try:
+        wait_ready(args.url, args.ready_timeout)
+        sampler = ProcessSampler(pid)
+        summaries, samples = [], []
+        for stage, sessions in enumerate(int(n) for n in args.sessions.split(",")):
+            summary, lines = run_stage(stage, sessions, args, sampler, print_line)
+            summaries.append(summary)
+            samples.extend(lines)
+    finally:
+        if process is not None:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=30)
+
+    print(f"\n{'sessions':>8}  {'req/s':>7}  {'p50 ms':>7}  {'p95 ms':>7}  {'p99 ms':>7}  {'errors':>6}  "
+          f"{'cpu %':>6}  {'rss MB':>7}")
+    for s in summaries:
+        print(f"{s['sessions']:>8d}  {s['rps']:>7.1f}  {fmt(s['score_p50_ms'], '>7.0f')}  "
+              f"{fmt(s['score_p95_ms'], '>7.0f')}  {fmt(s['score_p99_ms'], '>7.0f')}  "
+              f"{s['error_rate'] * 100:>5.1f}%  {fmt(s['cpu_percent_mean'], '>6.1f')}  {fmt(s['rss_mb_max'], '>7.1f')}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "stages": summaries, "samples": samples}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Stage-level latency and memory benchmarks for the scoring pipeline.
+
+Usage:
+    python benchmarks/run.py [--runs 30] [--output benchmarks/results.json]
+                             [--baseline benchmarks/baseline.json] [--save-baseline]
+                             [--fixtures FILE] [--latency-ms 0] [--tolerance 0.2]
+
+Semantic Scholar is replaced by the local stub (benchmarks/stub_scholar.py),
+serving the recorded responses in ``--fixtures`` and deterministic synthetic
+ones for any other query, so runs need no network. Caches live in a
+temporary directory.
+
+Stages:
+    sent_tokenize           sentence splitting
+    embed                   one model call for all sentences of a paragraph
+    fetch_research_papers   cold (new problem: search + paper embeddings) and warm (cached);
+                            cold problems have a search query of their own and run
+                            with the semantic paper cache off, so nothing is reused
+    score_paragraph         batched scoring against the fetched papers
+    analyze_sentences       per-sentence feedback
+    score_route             POST /score through the Flask test client
+
+Each stage runs for every paragraph length (``short``/``medium``/``long``)
+and, where papers are involved, every paper count. Every sentence is unique
+per run, position and paragraph length, so the sentence cache does not hide
+the encode cost.
+
+Results are written as JSON with p50/p95/p99/mean latency in ms and the peak
+traced Python allocation in KiB (measured in a separate, untimed pass). With
+a baseline, a case regresses when its p50 or p95 grows by more than
+``--tolerance`` (relative) and ``--min-delta-ms``; the exit status is 1 if any
+case regressed.
+
+Latencies depend on the machine and the model, so no baseline is shipped:
+record one on the machine that runs the comparison with ``--save-baseline``
+first. Without a baseline the results are still written, but the exit
+status is 2 so a check cannot pass without comparing anything.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import stub_scholar  # noqa: E402
+
+PARAGRAPH_SENTENCES = {"short": 2, "medium": 6, "long": 20}
+PAPER_COUNTS = (5, 10, 25)
+PROBLEM = "Impact of bee population decline on food security"
+SENTENCES = (
+    "Declining bee populations reduce pollination services for many crops.",
+    "These crops supply a large share of dietary micronutrients worldwide.",
+    "Field surveys link neonicotinoid exposure to colony losses.",
+    "We model regional yield under several pollinator decline scenarios.",
+    "Results suggest that habitat restoration offsets part of the loss.",
+    "However, the effect varies strongly between regions and seasons.",
+)
+
+
+def make_paragraph(n_sentences, run):
+    """Paragraph of ``n_sentences`` sentences, each unique to this run, position and length."""
+    return " ".join(
+        f"In draft {run}.{n_sentences}.{i}, {SENTENCES[i % len(SENTENCES)][0].lower()}{SENTENCES[i % len(SENTENCES)][1:]}"
+        for i in range(n_sentences))
+
+
+def cold_problem(count, run):
+    """A problem whose search query (its first key terms) no other run shares."""
+    return f"Cohort{run + 1000}x{count} {PROBLEM}"
+
+
+def fetch_cold(app, problem, count):
+    """fetch_research_papers with the semantic paper cache off, so no near-duplicate problem lends its papers."""
+    semantic, app.SEMANTIC_CACHE = app.SEMANTIC_CACHE, False
+    try:
+        return app.fetch_research_papers(problem, count)
+    finally:
+        app.SEMANTIC_CACHE = semantic
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure(fn, runs, warmup=1):
+    """Time ``fn(run)`` for ``runs`` runs, then trace one extra run for peak memory."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(warmup):
+            fn(-1 - i)
+        samples = []
+        for i in range(runs):
+            start = time.perf_counter()
+            fn(i)
+            samples.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        try:
+            fn(runs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "runs": runs,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def cases(app, client):
+    """Yield ``(stage, case, fn)``; ``fn(run)`` runs the stage once."""
+    for length, n in PARAGRAPH_SENTENCES.items():
+        yield "sent_tokenize", length, lambda run, n=n: app.sent_tokenize(make_paragraph(n, run))
+        yield "embed", length, lambda run, n=n: app.embed_many(app.sent_tokenize(make_paragraph(n, run)))
+        yield "analyze_sentences", length, lambda run, n=n: app.analyze_sentences(make_paragraph(n, run), PROBLEM)
+        yield "score_route", length, lambda run, n=n: client.post(
+            "/score", json={"paragraph": make_paragraph(n, run), "problem": PROBLEM, "session_id": "bench"})
+
+    for count in PAPER_COUNTS:
+        # Papers are cached per problem, so every paper count gets its own problem text.
+        problem = f"{PROBLEM} ({count} papers)"
+        yield "fetch_research_papers", f"cold/{count}", \
+            lambda run, count=count: fetch_cold(app, cold_problem(count, run), count)
+        with contextlib.redirect_stdout(io.StringIO()):
+            papers = app.fetch_research_papers(problem, count)
+        yield "fetch_research_papers", f"warm/{count}", \
+            lambda run, problem=problem, count=count: app.fetch_research_papers(problem, count)
+
+        for length, n in PARAGRAPH_SENTENCES.items():
+            yield "score_paragraph", f"{length}/{count}", \
+                lambda run, n=n, papers=papers: app.score_paragraph(make_paragraph(n, run), PROBLEM, papers)
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Return the cases whose p50 or p95 regressed against ``baseline``."""
+    previous = {(r["stage"], r["case"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get((result["stage"], result["case"]))
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            delta = result[metric] - old[metric]
+            if delta > min_delta_ms and result[metric] > old[metric] * (1 + tolerance):
+                regressions.append({"stage": result["stage"], "case": result["case"], "metric": metric,
+                                    "baseline": old[metric], "current": result[metric]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--output", default=os.path.join(HERE, "results.json"))
+    parser.add_argument("--baseline", default=os.path.join(HERE, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the new baseline")
+    parser.add_argument("--fixtures", help="JSON file mapping query -> recorded search response")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added by the stub per search")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--stage", action="append", help="Only run these stages (repeatable)")
+    args = parser.parse_args()
+
+    fixtures = stub_scholar.load_fixtures(args.fixtures) if args.fixtures else None
+    _, stub_url = stub_scholar.start(fixtures=fixtures, latency_ms=args.latency_ms)
+    os.environ["SEMANTIC_SCHOLAR_URL"] = stub_url
+    os.environ.setdefault("SCHOLAR_RATE", "1000")
+    os.environ.setdefault("SCHOLAR_BURST", "1000")
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-cache-")
+
+    import app
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.warmup()
+    client = app.app.test_client()
+
+    results = []
+    for stage, case, fn in cases(app, client):
+        if args.stage and stage not in args.stage:
+            continue
+        result = dict(stage=stage, case=case, **measure(fn, args.runs))
+        results.append(result)
+        print(f"{stage:>22} {case:>10}  p50 {result['p50_ms']:9.2f}  p95 {result['p95_ms']:9.2f}  "
+              f"p99 {result['p99_ms']:9.2f} ms  peak {result['peak_kib']:9.1f} KiB")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": args.runs,
+        "stub_latency_ms": args.latency_ms,
+        "embed_batching": app.EMBED_SCHEDULER is not None,
+        "embedding_precision": app.EMBEDDING_PRECISION,
+        "results": results,
+    }
+
+    status = 0
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}: nothing compared. On the first run on this machine, "
+              f"record one with --save-baseline.")
+        status = 2
+    elif not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} {r['case']} {r['metric']}: {r['baseline']} -> {r['current']} ms")
+        if not regressions:
+            print(f"No regressions against {args.baseline}")
+        status = 1 if regressions else 0
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
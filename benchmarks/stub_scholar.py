@@ -0,0 +1,189 @@
+"""
+Local stand-in for the Semantic Scholar ``/graph/v1/paper/search`` endpoint.
+
+Responses come from a recorded fixture file when the query is in it and are
+otherwise generated deterministically from the query, so runs are repeatable
+and need no network. Latency and error injection make it usable for
+exercising retries, rate limiting and load tests.
+
+Usage:
+    python benchmarks/stub_scholar.py --port 8765 [--fixtures FILE] [--latency-ms 200] [--error-rate 0.1]
+        [--error-status 503] [--retry-after 1]
+
+then start the server with ``SEMANTIC_SCHOLAR_URL=http://127.0.0.1:8765/graph/v1``.
+``GET /_stats`` returns request counts.
+
+Record real responses for a fixture file (needs network access):
+    python benchmarks/stub_scholar.py --record FILE --query "bee decline" --query "..." [--limit 25]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+VOCABULARY = (
+    "pollinator bee decline food security crop yield pesticide habitat loss colony "
+    "collapse honey wild species agriculture climate nutrition economic model network "
+    "learning data analysis survey field experiment population dynamics management policy"
+).split()
+
+
+def synthetic_response(query: str, limit: int) -> dict:
+    """Deterministic fake search results for ``query``."""
+    rng = random.Random(hashlib.md5(query.encode("utf-8")).hexdigest())
+    terms = query.split() or VOCABULARY[:3]
+    papers = []
+    for i in range(limit):
+        words = [rng.choice(terms + VOCABULARY) for _ in range(7)]
+        sentences = [
+            " ".join(rng.choice(terms + VOCABULARY) for _ in range(rng.randint(10, 20))).capitalize() + "."
+            for _ in range(rng.randint(3, 10))
+        ]
+        papers.append({
+            "paperId": hashlib.sha1(f"{query}:{i}".encode("utf-8")).hexdigest(),
+            "title": " ".join(words).capitalize(),
+            "abstract": " ".join(sentences),
+            "authors": [{"authorId": str(rng.randint(1, 10 ** 6)), "name": f"Author {rng.randint(1, 999)}"}
+                        for _ in range(rng.randint(1, 6))],
+            "year": rng.randint(1995, 2025),
+            "citationCount": rng.randint(0, 2000),
+        })
+    return {"total": limit, "offset": 0, "data": papers}
+
+
+class StubState:
+    def __init__(self, fixtures=None, latency_ms=0.0, error_rate=0.0, seed=0,
+                 error_status=429, retry_after="0", fail_first=0):
+        self.fixtures = fixtures or {}
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.fail_first = fail_first
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.queries = {}
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/_stats":
+                with state.lock:
+                    return self._send(200, {"requests": state.requests, "errors": state.errors,
+                                            "queries": state.queries})
+            if not url.path.endswith("/paper/search"):
+                return self._send(404, {"error": "Not found"})
+
+            params = parse_qs(url.query)
+            query = params.get("query", [""])[0]
+            limit = int(params.get("limit", ["10"])[0])
+            with state.lock:
+                state.requests += 1
+                state.queries[query] = state.queries.get(query, 0) + 1
+                fail = state.fail_first > 0 or state.rng.random() < state.error_rate
+                state.fail_first = max(0, state.fail_first - 1)
+                if fail:
+                    state.errors += 1
+            if state.latency_ms:
+                time.sleep(state.latency_ms / 1000.0)
+            if fail:
+                headers = {"Retry-After": state.retry_after} if state.retry_after is not None else {}
+                return self._send(state.error_status, {"message": "Injected error"}, headers)
+            payload = state.fixtures.get(query) or synthetic_response(query, limit)
+            self._send(200, payload)
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connections under concurrent load tests.
+    request_queue_size = 1024
+
+
+def start(port=0, fixtures=None, latency_ms=0.0, error_rate=0.0, error_status=429, retry_after="0", fail_first=0):
+    """
+    Start the stub in a daemon thread; returns ``(server, base_url)``.
+
+    Injected errors answer with ``error_status`` and a ``Retry-After`` of
+    ``retry_after`` (None leaves the header out). The first ``fail_first``
+    searches always fail; after that a fraction ``error_rate`` does.
+    """
+    state = StubState(fixtures, latency_ms, error_rate, error_status=error_status,
+                      retry_after=retry_after, fail_first=fail_first)
+    server = StubServer(("127.0.0.1", port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/graph/v1"
+
+
+def load_fixtures(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def record(path, queries, limit):
+    """Fetch ``queries`` from the real API and add the responses to the fixture file at ``path``."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from scholar_client import SemanticScholarClient
+
+    fixtures = load_fixtures(path) if os.path.exists(path) else {}
+    client = SemanticScholarClient(api_key=os.environ.get("SEMANTIC_SCHOLAR_API_KEY"))
+    for query in queries:
+        fixtures[query] = client.search(query, limit)
+        print(f"Recorded {len(fixtures[query].get('data') or [])} papers for {query!r}")
+    with open(path, "w") as f:
+        json.dump(fixtures, f, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Semantic Scholar search stub.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="JSON file mapping query -> recorded response")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=429, help="Status of injected errors")
+    parser.add_argument("--retry-after", default="0", help="Retry-After header of injected errors")
+    parser.add_argument("--record", metavar="FILE", help="Record --query responses from the real API into FILE")
+    parser.add_argument("--query", action="append", default=[])
+    parser.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.record:
+        return record(args.record, args.query, args.limit)
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    state = StubState(fixtures, args.latency_ms, args.error_rate,
+                      error_status=args.error_status, retry_after=args.retry_after)
+    server = StubServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"Stub Semantic Scholar on http://127.0.0.1:{args.port}/graph/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Response compression shared by app.py and async_app.py.
+
+Finished (non-streamed) text responses above a size threshold are encoded
+with brotli when the optional ``brotli`` package is installed and the client
+accepts it, else with gzip. Streamed NDJSON/SSE responses are left alone so
+events are not held back by the compressor.
+"""
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE = {"application/json", "text/html", "text/plain", "text/css", "application/javascript"}
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for an ``Accept-Encoding`` header: ``br``, ``gzip`` or None."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def compressible(response) -> bool:
+    """Whether a finished response is worth compressing (by type, status and existing encoding)."""
+    return (response.mimetype in COMPRESSIBLE
+            and 200 <= response.status_code < 300 and response.status_code != 204
+            and "Content-Encoding" not in response.headers)
+
+
+def encode(response, body: bytes, accept_encoding: str, min_bytes: int = 1024):
+    """Replace the body of ``response`` with its compressed form when it is at least ``min_bytes``."""
+    if len(body) < min_bytes:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The compressed bytes differ from what a strong ETag promised.
+        response.set_etag(etag, weak=True)
+    return response
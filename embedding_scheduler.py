@@ -0,0 +1,114 @@
+"""
+Cross-request micro-batching for the embedding model.
+
+Request threads hand their texts to one ``EmbeddingScheduler`` instead of
+calling the model themselves. A single worker thread collects queued texts
+until either ``max_batch_size`` texts are waiting or the oldest has waited
+``max_wait_ms``, encodes them as one length-sorted batch, and resolves each
+caller's futures. Many small concurrent encodes become a few large ones.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class _Item:
+    __slots__ = ("text", "future", "queued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.queued_at = time.monotonic()
+
+
+class EmbeddingScheduler:
+    """
+    Args:
+        encode: Function mapping a list of texts to a matrix with one row per text
+        max_batch_size: Texts encoded per model call at most
+        max_wait_ms: Longest time a text waits for the batch to fill
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "deque[_Item]" = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._batches = 0
+        self._texts = 0
+        self._encoded = 0
+        self._encode_seconds = 0.0
+        self._max_queue_depth = 0
+        self._batch_sizes: Dict[int, int] = {}
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        """Queue ``texts``; each future resolves to that text's embedding row."""
+        items = [_Item(t) for t in texts]
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+                self._worker.start()
+            self._queue.extend(items)
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return [item.future for item in items]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking helper: submit ``texts`` and stack the results."""
+        return np.stack([f.result() for f in self.submit(texts)])
+
+    def _next_batch(self) -> List[_Item]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0].queued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Identical texts from different requests are encoded once.
+            unique = sorted({item.text for item in batch}, key=len)
+            start = time.perf_counter()
+            try:
+                vectors = self._encode(unique)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+            rows = dict(zip(unique, vectors))
+            for item in batch:
+                item.future.set_result(rows[item.text])
+            with self._cond:
+                self._batches += 1
+                self._texts += len(batch)
+                self._encoded += len(unique)
+                self._encode_seconds += elapsed
+                self._batch_sizes[len(unique)] = self._batch_sizes.get(len(unique), 0) + 1
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "texts": self._texts,
+                "encoded": self._encoded,
+                "mean_batch_size": round(self._encoded / self._batches, 2) if self._batches else 0,
+                "encode_seconds": round(self._encode_seconds, 3),
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            }
@@ -0,0 +1,166 @@
+"""
+Persistent, content-addressed store for text embeddings.
+
+Vectors live in a fixed-size memory-mapped float32 file and a small SQLite
+index maps each key to its row. Keys are a SHA-1 of the model name plus the
+text, so the same abstract is only ever encoded once per model. Because the
+vector file is mapped shared, several worker processes read the same pages
+from the OS page cache instead of each holding its own copy. Vectors can be
+kept in float16 or int8 (see quantize.py) to fit more of them in memory.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from quantize import PRECISIONS, check_precision, dequantize, quantize
+
+_EXTENSIONS = {"float32": ".f32", "float16": ".f16", "int8": ".i8"}
+
+
+class EmbeddingStore:
+    """
+    Fixed-capacity embedding store with least-recently-used eviction.
+
+    Args:
+        path: Directory holding the vector file and its index
+        dim: Embedding dimension of the model
+        model_name: Name of the model, folded into every key
+        capacity: Maximum number of vectors kept on disk
+        precision: Storage precision, ``float32``, ``float16`` or ``int8``
+    """
+
+    def __init__(self, path: str, dim: int, model_name: str, capacity: int = 50000,
+                 precision: str = "float32"):
+        os.makedirs(path, exist_ok=True)
+        self.dim = dim
+        self.model_name = model_name
+        self.capacity = capacity
+        self.precision = check_precision(precision)
+        self._lock = threading.Lock()
+
+        base = os.path.join(path, f"store-{capacity}x{dim}")
+        if self.precision != "float32":
+            base += f"-{self.precision}"
+        vector_path = base + _EXTENSIONS[self.precision]
+        created = not os.path.exists(vector_path)
+        mode = "w+" if created else "r+"
+        self._vectors = np.memmap(vector_path, dtype=PRECISIONS[self.precision], mode=mode, shape=(capacity, dim))
+        self._scales = None
+        if self.precision == "int8":
+            self._scales = np.memmap(base + ".scales", dtype=np.float32, mode=mode, shape=(capacity,))
+        # Per-row tag of the key that owns the row. Readers re-check it after
+        # copying a vector so a row rewritten by another process is a miss.
+        self._tags = np.memmap(base + ".tags", dtype=np.uint64, mode=mode, shape=(capacity,))
+
+        self._index_path = base + ".sqlite"
+        self._db = None
+        self._db_pid = None
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            " slot INTEGER PRIMARY KEY, key TEXT UNIQUE, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS slots_last_used ON slots (last_used)")
+        self._conn.execute("BEGIN IMMEDIATE")
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM slots").fetchone()
+        if count < capacity:
+            # Free rows have no key and last_used 0, so they are handed out first.
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO slots (slot, key, last_used) VALUES (?, NULL, 0)",
+                ((i,) for i in range(capacity)),
+            )
+        self._conn.execute("COMMIT")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Index connection for this process; a forked worker opens its own."""
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self._index_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _tag(key: str) -> int:
+        return int(key[:16], 16) or 1
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors for ``texts`` as float32; missing entries come back as None."""
+        return [None if hit is None else dequantize(*hit) for hit in self.get_codes(texts)]
+
+    def get_codes(self, texts: List[str]) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """Look up ``(codes, scale)`` pairs in the storage precision; missing entries are None."""
+        keys = [self.key(t) for t in texts]
+        if not keys:
+            return []
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"SELECT key, slot FROM slots WHERE key IN ({marks})", chunk)
+                found.update(rows.fetchall())
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE slots SET last_used = ? WHERE key = ?",
+                    ((now, k) for k in found),
+                )
+
+        results = []
+        for k in keys:
+            slot = found.get(k)
+            if slot is None:
+                results.append(None)
+                continue
+            codes = np.array(self._vectors[slot])
+            scale = np.array([1.0 if self._scales is None else self._scales[slot]], dtype=np.float32)
+            results.append((codes, scale) if int(self._tags[slot]) == self._tag(k) else None)
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Store one vector per text, evicting the least recently used rows when full."""
+        if not len(texts):
+            return
+        codes, scales = quantize(vectors, self.precision)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                for text, code, scale in zip(texts, codes, scales):
+                    k = self.key(text)
+                    if self._conn.execute("SELECT 1 FROM slots WHERE key = ?", (k,)).fetchone():
+                        continue
+                    (slot,) = self._conn.execute(
+                        "SELECT slot FROM slots ORDER BY last_used LIMIT 1"
+                    ).fetchone()
+                    self._tags[slot] = 0
+                    self._vectors[slot] = code
+                    if self._scales is not None:
+                        self._scales[slot] = scale
+                    self._tags[slot] = self._tag(k)
+                    self._conn.execute(
+                        "UPDATE slots SET key = ?, last_used = ? WHERE slot = ?",
+                        (k, now, slot),
+                    )
+                self._vectors.flush()
+                self._tags.flush()
+                if self._scales is not None:
+                    self._scales.flush()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(key) FROM slots").fetchone()
+        return count
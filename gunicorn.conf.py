@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for running several workers that share one model copy.
+
+The app is imported once in the master with the model loaded (pre-fork
+preload), so forked workers share the model's weights through copy-on-write
+instead of each loading its own. Nothing is encoded in the master: the
+embedding scheduler thread and torch's worker threads start in each worker.
+
+Usage:
+    pip install -r requirements.txt -r requirements-serve.txt
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+# Load the model while the master imports app.py.
+os.environ.setdefault("MODEL_LOAD", "eager")
+
+bind = os.environ.get("BIND", "127.0.0.1:5001")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+preload_app = True
+timeout = 120
+
+
+def post_fork(server, worker):
+    # Warm each worker (tokenizer, first encode) before it takes traffic.
+    import app
+    app.start_background_load()
@@ -0,0 +1,117 @@
+"""
+In-memory BM25 index over every paper the service has fetched.
+
+Papers are added incrementally as Semantic Scholar results arrive (and from
+the paper cache at startup), so a problem worded slightly differently from
+an earlier one can be answered from, or topped up with, papers already seen
+-- without another API call. Postings are plain dicts of term -> {doc: tf};
+a query touches only the postings of its own terms.
+"""
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+STOP_WORDS = frozenset(
+    "the a an and or but in on at to for of with by is are was were be been being have has had do does did "
+    "will would should could can may might must this that these those we you they how what why when where "
+    "which who it its as from into than then there their our not no also such using used use based between "
+    "via over under about among within without study paper results".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words, with a light plural strip."""
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if token in STOP_WORDS or len(token) < 2:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 over paper titles and abstracts.
+
+    Args:
+        max_documents: Papers kept; the oldest are dropped beyond this
+        k1: BM25 term-frequency saturation
+        b: BM25 length normalization
+        title_weight: How many times title terms are counted
+    """
+
+    def __init__(self, max_documents: int = 50000, k1: float = 1.5, b: float = 0.75, title_weight: int = 2):
+        self.max_documents = max_documents
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self._docs: "OrderedDict[str, Tuple[Dict, Dict[str, int], int]]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def add(self, doc_id: str, paper: Dict):
+        """Index ``paper`` under ``doc_id``; re-adding an id only refreshes its age."""
+        with self._lock:
+            if doc_id in self._docs:
+                self._docs.move_to_end(doc_id)
+                return
+            terms = Counter(tokenize(paper.get("title", "")) * self.title_weight)
+            terms.update(tokenize(paper.get("abstract", "") or paper.get("text", "")))
+            length = sum(terms.values())
+            self._docs[doc_id] = (paper, terms, length)
+            self._total_length += length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            while len(self._docs) > self.max_documents:
+                self._remove(next(iter(self._docs)))
+
+    def add_many(self, items: Iterable[Tuple[str, Dict]]):
+        for doc_id, paper in items:
+            self.add(doc_id, paper)
+
+    def _remove(self, doc_id: str):
+        _, terms, length = self._docs.pop(doc_id)
+        self._total_length -= length
+        for term in terms:
+            posting = self._postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score of every document sharing a term with ``query``."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return {}
+            avg_length = self._total_length / n
+            results: Dict[str, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    length = self._docs[doc_id][2]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    results[doc_id] = results.get(doc_id, 0.0) + idf * norm
+            return results
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[Dict, float]]:
+        """The ``k`` best matching papers as ``(paper, score)``, best first."""
+        scores = self.scores(query)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        with self._lock:
+            return [(self._docs[doc_id][0], score) for doc_id, score in best if doc_id in self._docs]
+
+    def __len__(self) -> int:
+        return len(self._docs)
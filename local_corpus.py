@@ -0,0 +1,253 @@
+"""
+Offline paper corpus with an approximate nearest-neighbour index.
+
+A corpus is built once from a JSONL dump (one paper per line with at least a
+``title`` and/or ``abstract``) and written to a directory:
+
+    manifest.json   model name, dimension, paper count, index parameters
+    vectors.f32     memory-mapped float32 matrix, one normalized row per paper
+    papers.jsonl    paper metadata, same order as the vectors
+    offsets.i64     byte offset of each line in papers.jsonl
+    ivf.npz         inverted-file index: centroids and rows grouped by centroid
+
+Searching probes the ``nprobe`` centroids closest to the query and scores only
+the rows filed under them, so lookups touch a small slice of the corpus and
+need no network. Small corpora skip the index and are searched exactly.
+
+Usage:
+    python local_corpus.py build papers.jsonl --out .cache/corpus
+    python local_corpus.py query .cache/corpus "bee decline and food security"
+"""
+import argparse
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+EXACT_SEARCH_MAX_ROWS = 4096
+
+
+def _paper_from_record(record: Dict) -> Optional[Dict]:
+    """Normalize a corpus record into the paper dict used by app.py."""
+    title = record.get("title") or ""
+    abstract = record.get("abstract") or ""
+    text = ""
+    if title:
+        text += title + ". "
+    if abstract:
+        text += abstract
+    if not text.strip():
+        return None
+    authors = []
+    for a in record.get("authors") or []:
+        if isinstance(a, dict) and a.get("name"):
+            authors.append(a["name"])
+        elif isinstance(a, str):
+            authors.append(a)
+    return {
+        "title": title,
+        "abstract": abstract,
+        "text": text.strip(),
+        "authors": authors,
+        "year": record.get("year"),
+        "citations": record.get("citationCount", record.get("citations", 0)) or 0,
+    }
+
+
+def _read_corpus(path: str) -> Iterator[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            paper = _paper_from_record(json.loads(line))
+            if paper is not None:
+                yield paper
+
+
+def _kmeans(sample: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                centroids[c] = sample[rng.integers(len(sample))]
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+    return centroids.astype(np.float32)
+
+
+def build(corpus_path: str, out_dir: str, model_name: str = "all-MiniLM-L6-v2",
+          batch_size: int = 256, nlist: Optional[int] = None) -> Dict:
+    """
+    Embed a JSONL corpus and write vectors, metadata and the IVF index to ``out_dir``.
+
+    Args:
+        corpus_path: JSONL file with title/abstract/authors/year/citationCount fields
+        out_dir: Output directory
+        model_name: SentenceTransformer model; must match the one the server uses
+        batch_size: Papers encoded per model call
+        nlist: Number of IVF lists (defaults to about sqrt of the corpus size)
+
+    Returns:
+        The manifest that was written
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    dim = model.get_sentence_embedding_dimension()
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+
+    with open(os.path.join(out_dir, "vectors.f32"), "wb") as vec_out, \
+            open(os.path.join(out_dir, "papers.jsonl"), "wb") as meta_out, \
+            open(os.path.join(out_dir, "offsets.i64"), "wb") as off_out:
+        batch: List[Dict] = []
+
+        def flush():
+            vectors = model.encode([p["text"][:1000] for p in batch], normalize_embeddings=True)
+            vec_out.write(np.asarray(vectors, dtype=np.float32).tobytes())
+            for paper in batch:
+                off_out.write(np.int64(meta_out.tell()).tobytes())
+                meta_out.write(json.dumps(paper).encode("utf-8") + b"\n")
+            batch.clear()
+
+        for paper in _read_corpus(corpus_path):
+            batch.append(paper)
+            count += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    if count == 0:
+        raise ValueError(f"No papers with a title or abstract in {corpus_path}")
+
+    vectors = np.memmap(os.path.join(out_dir, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+    if nlist is None:
+        nlist = 1 if count <= EXACT_SEARCH_MAX_ROWS else int(np.sqrt(count))
+    nlist = max(1, min(nlist, count))
+
+    if nlist > 1:
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(count, min(count, 50 * nlist), replace=False))
+        centroids = _kmeans(np.asarray(vectors[sample_rows]), nlist)
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            assign[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        rows = np.argsort(assign, kind="stable").astype(np.int32)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        np.savez(os.path.join(out_dir, "ivf.npz"), centroids=centroids, rows=rows, offsets=list_offsets)
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "model": model_name,
+        "dim": dim,
+        "count": count,
+        "nlist": nlist,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class LocalCorpus:
+    """
+    Read-only view of a built corpus directory.
+
+    Args:
+        path: Directory written by ``build``
+        nprobe: IVF lists scanned per query (more is slower and more exact)
+    """
+
+    def __init__(self, path: str, nprobe: int = 8):
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format in {path}: {self.manifest.get('version')}")
+        self.model_name = self.manifest["model"]
+        self.count = self.manifest["count"]
+        self.nprobe = nprobe
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r",
+                                 shape=(self.count, self.manifest["dim"]))
+        self._offsets = np.memmap(os.path.join(path, "offsets.i64"), dtype=np.int64, mode="r")
+        self._meta_path = os.path.join(path, "papers.jsonl")
+        self._centroids = None
+        if self.manifest["nlist"] > 1:
+            ivf = np.load(os.path.join(path, "ivf.npz"))
+            self._centroids = ivf["centroids"]
+            self._rows = ivf["rows"]
+            self._list_offsets = ivf["offsets"]
+
+    def search(self, vector: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(rows, scores)`` of the ``k`` papers most similar to ``vector``, best first."""
+        if self._centroids is None:
+            candidates = np.arange(self.count)
+            scores = self.vectors @ vector
+        else:
+            nprobe = min(self.nprobe, len(self._centroids))
+            probe = np.argpartition(-(self._centroids @ vector), nprobe - 1)[:nprobe]
+            candidates = np.sort(np.concatenate([
+                self._rows[self._list_offsets[c]:self._list_offsets[c + 1]] for c in probe
+            ]))
+            scores = self.vectors[candidates] @ vector
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    def papers(self, rows: np.ndarray) -> List[Dict]:
+        """Load paper metadata for ``rows`` with each stored vector attached as ``embedding``."""
+        results = []
+        with open(self._meta_path, "rb") as f:
+            for row in rows:
+                f.seek(int(self._offsets[row]))
+                paper = json.loads(f.readline())
+                paper["embedding"] = np.array(self.vectors[row])
+                paper["source"] = "local"
+                results.append(paper)
+        return results
+
+    def search_papers(self, vector: np.ndarray, k: int = 10) -> List[Dict]:
+        rows, _ = self.search(vector, k)
+        return self.papers(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query an offline paper corpus.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Embed a JSONL corpus and write the index")
+    b.add_argument("corpus", help="JSONL file, one paper per line")
+    b.add_argument("--out", required=True, help="Output directory")
+    b.add_argument("--model", default="all-MiniLM-L6-v2")
+    b.add_argument("--batch-size", type=int, default=256)
+    b.add_argument("--nlist", type=int, default=None)
+    q = sub.add_parser("query", help="Print the nearest papers for a text")
+    q.add_argument("corpus_dir")
+    q.add_argument("text")
+    q.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build(args.corpus, args.out, args.model, args.batch_size, args.nlist)
+        print(f"Indexed {manifest['count']} papers into {args.out} ({manifest['nlist']} lists)")
+    else:
+        from sentence_transformers import SentenceTransformer
+
+        corpus = LocalCorpus(args.corpus_dir)
+        vector = SentenceTransformer(corpus.model_name).encode(args.text, normalize_embeddings=True)
+        rows, scores = corpus.search(vector, args.k)
+        for paper, score in zip(corpus.papers(rows), scores):
+            print(f"{score:.3f}  {paper['title']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Streaming analysis of whole manuscripts (plain text or Markdown).
+
+The document is read line by line and split into sections (Markdown
+headings) and paragraphs (blank-line separated, over-long ones cut at a
+sentence end), so only the current paragraph and one scoring batch are ever
+held in memory. app.py scores the chunks in batches and feeds the results to
+``ManuscriptStats``, which keeps running per-section and document averages,
+the most and least novel passages, and the coherence across paragraph
+boundaries -- all in constant memory.
+
+Usage:
+    python manuscript.py paper.md --problem "Impact of bee decline on food security" [--batch-size 32] [--json]
+"""
+import argparse
+import heapq
+import json
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_SETEXT = re.compile(r"^\s{0,3}(=+|-+)\s*$")
+_FENCE = re.compile(r"^\s{0,3}(```|~~~)")
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+
+BREAKDOWN_KEYS = ("novelty", "alignment", "coherence", "relevance")
+
+
+def _cut(text: str, max_chars: int) -> Tuple[str, str]:
+    """Split ``text`` after the last sentence end (else the last space) before ``max_chars``."""
+    ends = [m.end() for m in _SENTENCE_END.finditer(text, 0, max_chars)]
+    cut = ends[-1] if ends else (text.rfind(" ", 0, max_chars) + 1 or max_chars)
+    return text[:cut].strip(), text[cut:].lstrip()
+
+
+def iter_paragraphs(lines: Iterable[str], max_chars: int = 2000) -> Iterator[Tuple[str, str]]:
+    """
+    Yield ``(section_title, paragraph)`` pairs from an iterable of lines.
+
+    Markdown ATX (``# Title``) and setext headings start a new section, fenced
+    code blocks are skipped, and paragraphs longer than ``max_chars`` are cut
+    into several chunks at sentence ends.
+    """
+    section = ""
+    buffer: List[str] = []
+    size = 0
+    in_fence = False
+
+    def flush():
+        nonlocal size
+        text = " ".join(buffer).strip()
+        buffer.clear()
+        size = 0
+        return text
+
+    for raw in lines:
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8", errors="replace")
+        line = raw.rstrip("\r\n")
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+
+        heading = _HEADING.match(line)
+        if heading is None and buffer and len(buffer) == 1 and _SETEXT.match(line) and line.strip()[0] in "=-":
+            # "Title\n=====" -- the buffered line was a heading, not a paragraph.
+            section = flush()
+            continue
+        if heading is not None or not line.strip():
+            text = flush()
+            if text:
+                yield section, text
+            if heading is not None:
+                section = heading.group(2)
+            continue
+
+        buffer.append(line.strip())
+        size += len(line) + 1
+        while size > max_chars:
+            chunk, rest = _cut(" ".join(buffer), max_chars)
+            yield section, chunk
+            buffer[:] = [rest] if rest else []
+            size = len(rest)
+
+    text = flush()
+    if text:
+        yield section, text
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def preview(text: str, length: int = 160) -> str:
+    return text if len(text) <= length else text[:length].rsplit(" ", 1)[0] + "..."
+
+
+class _Running:
+    """Length-weighted running mean of scores and breakdowns."""
+
+    __slots__ = ("weight", "score", "breakdown", "count")
+
+    def __init__(self):
+        self.weight = 0
+        self.score = 0.0
+        self.breakdown = dict.fromkeys(BREAKDOWN_KEYS, 0.0)
+        self.count = 0
+
+    def add(self, result: Dict, weight: int):
+        self.weight += weight
+        self.count += 1
+        self.score += result["score"] * weight
+        for key in BREAKDOWN_KEYS:
+            self.breakdown[key] += result["breakdown"].get(key, 0) * weight
+
+    def summary(self) -> Dict:
+        if not self.weight:
+            return {"score": 0, "breakdown": {}, "paragraphs_scored": 0}
+        return {
+            "score": round(self.score / self.weight, 1),
+            "breakdown": {k: round(v / self.weight, 1) for k, v in self.breakdown.items()},
+            "paragraphs_scored": self.count,
+        }
+
+
+class ManuscriptStats:
+    """
+    Constant-memory aggregates over scored paragraphs.
+
+    Args:
+        top_k: Number of most and least novel passages kept
+    """
+
+    def __init__(self, top_k: int = 5):
+        self.top_k = top_k
+        self.document = _Running()
+        self.section: Optional[_Running] = None
+        self.section_title: Optional[str] = None
+        self.section_index = -1
+        self.section_boundary_sum = 0.0
+        self.section_boundary_count = 0
+        self.boundaries = 0
+        self.boundary_sum = 0.0
+        self.paragraphs = 0
+        self._most: List[Tuple[float, int, Dict]] = []
+        self._least: List[Tuple[float, int, Dict]] = []
+
+    def add(self, index: int, section: str, text: str, result: Dict,
+            boundary: Optional[float]) -> List[Dict]:
+        """Record one paragraph; returns the ``section`` event of a section it closes, if any."""
+        events = []
+        if section != self.section_title or self.section is None:
+            if self.section is not None:
+                events.append(self.close_section())
+            self.section = _Running()
+            self.section_title = section
+            self.section_index += 1
+            self.section_boundary_sum = 0.0
+            self.section_boundary_count = 0
+        elif boundary is not None:
+            # Only paragraph transitions inside a section count towards its coherence.
+            self.section_boundary_sum += boundary
+            self.section_boundary_count += 1
+
+        self.paragraphs += 1
+        if boundary is not None:
+            self.boundaries += 1
+            self.boundary_sum += boundary
+        if not result.get("breakdown"):
+            return events
+
+        weight = len(text)
+        self.document.add(result, weight)
+        self.section.add(result, weight)
+        novelty = result["breakdown"]["novelty"]
+        passage = {"index": index, "section": section, "novelty": novelty,
+                   "score": result["score"], "text": preview(text)}
+        self._push(self._most, novelty, index, passage)
+        self._push(self._least, -novelty, index, passage)
+        return events
+
+    def _push(self, heap, key, index, passage):
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, (key, -index, passage))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, -index, passage))
+
+    def close_section(self) -> Dict:
+        count = self.section_boundary_count
+        event = {"event": "section", "index": self.section_index, "title": self.section_title}
+        event.update(self.section.summary())
+        event["boundary_coherence"] = round(100 * self.section_boundary_sum / count, 1) if count else None
+        self.section = None
+        return event
+
+    def finish(self) -> List[Dict]:
+        events = []
+        if self.section is not None:
+            events.append(self.close_section())
+        event = {"event": "document", "paragraphs": self.paragraphs, "sections": self.section_index + 1}
+        event.update(self.document.summary())
+        event.update(
+            boundary_coherence=round(100 * self.boundary_sum / self.boundaries, 1) if self.boundaries else None,
+            most_novel=[p for _, _, p in sorted(self._most, reverse=True)],
+            least_novel=[p for _, _, p in sorted(self._least, reverse=True)],
+        )
+        events.append(event)
+        return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a manuscript section by section.")
+    parser.add_argument("path", help="Text or Markdown file ('-' for stdin)")
+    parser.add_argument("--problem", required=True, help="Research problem the manuscript addresses")
+    parser.add_argument("--batch-size", type=int, default=32, help="Paragraphs scored per batch")
+    parser.add_argument("--detail", action="store_true", help="Include per-sentence feedback")
+    parser.add_argument("--json", action="store_true", help="Print every event as NDJSON")
+    args = parser.parse_args()
+
+    import app
+
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", errors="replace")
+    with stream:
+        for event in app.iter_manuscript_events(stream, args.problem, args.batch_size, args.detail):
+            if args.json:
+                print(json.dumps(event), flush=True)
+            elif event["event"] == "section":
+                print(f"[{event['score']:5.1f}] {event['title'] or '(untitled)'} "
+                      f"({event['paragraphs_scored']} paragraphs)", flush=True)
+            elif event["event"] == "document":
+                print(f"\nDocument score {event['score']} over {event['paragraphs']} paragraphs "
+                      f"in {event['sections']} sections; breakdown {event['breakdown']}")
+                print(f"Coherence across paragraph boundaries: {event['boundary_coherence']}")
+                for label in ("most_novel", "least_novel"):
+                    print(f"\n{label.replace('_', ' ').capitalize()}:")
+                    for p in event[label]:
+                        print(f"  {p['novelty']:5.1f}  [{p['section'] or '-'}] {p['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+In-process metrics with a Prometheus text exposition.
+
+Counters and histograms are kept in plain dicts under one lock and rendered
+on demand by ``render()`` for the /metrics endpoint. ``stage(name)`` times a
+block of work: the duration goes into the ``stage_seconds`` histogram and
+into the current request's timing list, which app.py turns into a
+``Server-Timing`` header.
+
+With ``METRICS=0`` every call returns immediately: ``stage()`` hands back a
+shared no-op context manager and ``inc``/``observe`` are a single flag check.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+ENABLED = os.environ.get("METRICS", "1").lower() not in ("0", "false", "no")
+PREFIX = "research_companion_"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_lock = threading.Lock()
+_metrics: Dict[str, "_Metric"] = {}
+_gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+_request_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = PREFIX + name
+        self.help = help
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_label_text(k)} {v:g}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_text(key)} {count}")
+        return lines
+
+
+def counter(name: str, help: str) -> Counter:
+    with _lock:
+        return _metrics.setdefault(PREFIX + name, Counter(name, help))
+
+
+def histogram(name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    with _lock:
+        return _metrics.setdefault(PREFIX + name, Histogram(name, help, buckets))
+
+
+def gauge(name: str, help: str, fn: Callable[[], float]):
+    """Register a gauge whose value is read from ``fn()`` at render time."""
+    with _lock:
+        _gauges[PREFIX + name] = (help, fn)
+
+
+STAGE_SECONDS = histogram("stage_seconds", "Time spent per pipeline stage")
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage."""
+    if not ENABLED:
+        return _NO_STAGE
+    return _Stage(name)
+
+
+def start_request():
+    """Begin collecting stage timings for the current request."""
+    if ENABLED:
+        _request_timings.set([])
+
+
+def request_timings() -> Optional[List[Tuple[str, float]]]:
+    return _request_timings.get()
+
+
+def server_timing(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Format ``(stage, seconds)`` pairs as a Server-Timing header; repeated stages are summed."""
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    if total is not None:
+        merged["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in merged.items())
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        gauges = list(_gauges.items())
+    for name, (help, fn) in gauges:
+        try:
+            value = float(fn())
+        except Exception:
+            continue
+        lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value:g}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,346 @@
+"""
+Bounded, TTL-aware paper cache persisted to SQLite.
+
+Entries are kept in memory in LRU order, bounded by entry count and by the
+serialized size of their papers plus the embedding arrays attached to them
+(see ``account``), and mirrored to a SQLite file so a restarted
+process starts warm. Hits update the LRU order in memory at once and the
+``last_used`` column in batches (every ``flush_interval`` seconds, before
+capacity evictions and on ``flush``), so a restart warms up and evicts in
+recency order. Expired entries are still served for a grace period
+while a background thread refreshes them (stale-while-revalidate). Empty or
+failed fetches are cached only briefly. ``get_or_fetch_async`` does the same
+for coroutine fetchers, refreshing stale entries in an asyncio task.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+def _serializable(papers: List[Dict]) -> List[Dict]:
+    """Drop attached vectors; they live in the embedding store, not in the cache."""
+    return [{k: v for k, v in p.items() if k not in ("embedding", "embedding_scale")} for p in papers]
+
+
+def _vector_bytes(papers: List[Dict]) -> int:
+    """Bytes of the embedding arrays attached to ``papers``."""
+    return sum(getattr(p.get(name), "nbytes", 0) for p in papers for name in ("embedding", "embedding_scale"))
+
+
+class _Entry:
+    __slots__ = ("papers", "expires_at", "blob_size", "size")
+
+    def __init__(self, papers: List[Dict], expires_at: float, blob_size: int):
+        self.papers = papers
+        self.expires_at = expires_at
+        self.blob_size = blob_size
+        self.size = blob_size + _vector_bytes(papers)
+
+
+class PaperCache:
+    """
+    Paper lists keyed by problem hash.
+
+    Args:
+        path: SQLite file used for persistence (None keeps the cache in memory only)
+        max_entries: Maximum number of problems kept
+        max_bytes: Maximum total size of the serialized paper lists and their attached vectors
+        ttl: Seconds a non-empty result stays fresh
+        stale_ttl: Extra seconds an expired result may be served while it is refreshed
+        negative_ttl: Seconds an empty or failed result is cached
+        flush_interval: Seconds between writes of the hits' last-use times to SQLite
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1000,
+                 max_bytes: int = 64 * 1024 * 1024, ttl: float = 24 * 3600,
+                 stale_ttl: float = 7 * 24 * 3600, negative_ttl: float = 300,
+                 flush_interval: float = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.flush_interval = flush_interval
+        self._used: Dict[str, float] = {}
+        self._flushed_at = time.time()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._refreshing = set()
+        self._tasks = set()
+        self._path = path
+        self._db = None
+        self._db_pid = None
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS papers ("
+                " key TEXT PRIMARY KEY, papers TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._load()
+
+    @property
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        """SQLite connection for this process (reopened after a fork), or None without persistence."""
+        if self._path is None:
+            return None
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _load(self):
+        """Warm the in-memory LRU from disk, most recently used first."""
+        cutoff = time.time() - self.stale_ttl
+        rows = self._conn.execute(
+            "SELECT key, papers, expires_at FROM papers WHERE expires_at > ? ORDER BY last_used DESC",
+            (cutoff,),
+        ).fetchall()
+        with self._lock:
+            for key, blob, expires_at in rows:
+                if len(self._entries) >= self.max_entries or self._bytes + len(blob) > self.max_bytes:
+                    break
+                self._entries[key] = entry = _Entry(json.loads(blob), expires_at, len(blob))
+                self._entries.move_to_end(key, last=False)
+                self._bytes += entry.size
+            self._conn.execute("DELETE FROM papers WHERE expires_at <= ?", (cutoff,))
+            self._conn.commit()
+
+    def lookup(self, key: str) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """Return ``(papers, FRESH | STALE)``, or ``(None, None)`` when nothing usable is cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            now = time.time()
+            if now < entry.expires_at:
+                self._touch(key, now)
+                return entry.papers, FRESH
+            if entry.papers and now < entry.expires_at + self.stale_ttl:
+                self._touch(key, now)
+                return entry.papers, STALE
+            self._evict(key)
+            return None, None
+
+    def _touch(self, key: str, now: float):
+        self._entries.move_to_end(key)
+        if self._conn is None:
+            return
+        self._used[key] = now
+        if now - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the last-use times of hits since the previous flush to SQLite."""
+        with self._lock:
+            used, self._used = self._used, {}
+            self._flushed_at = time.time()
+            if self._conn is None or not used:
+                return
+            self._conn.executemany("UPDATE papers SET last_used = ? WHERE key = ?",
+                                   [(last_used, key) for key, last_used in used.items()])
+            self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        return self.lookup(key)[0] is not None
+
+    def set(self, key: str, papers: List[Dict], ttl: Optional[float] = None):
+        if ttl is None:
+            ttl = self.ttl if papers else self.negative_ttl
+        blob = json.dumps(_serializable(papers))
+        expires_at = time.time() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = entry = _Entry(papers, expires_at, len(blob))
+            self._bytes += entry.size
+            self._shrink()
+            if self._conn is not None and key in self._entries:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO papers (key, papers, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, expires_at, time.time()),
+                )
+                self._conn.commit()
+
+    def account(self, key: str):
+        """Re-measure ``key`` after vectors were attached to its papers, evicting to stay under max_bytes."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            size = entry.blob_size + _vector_bytes(entry.papers)
+            self._bytes += size - entry.size
+            entry.size = size
+            self._shrink()
+
+    def _shrink(self):
+        """Evict least recently used entries until both bounds hold."""
+        if self._used and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self.flush()
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._used.pop(key, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM papers WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        """
+        Return cached papers for ``key``, calling ``fetch`` only when needed.
+
+        Fresh entries are returned directly. Stale entries are returned at once
+        and refreshed in a background thread. On a miss ``fetch`` runs inline;
+        if it raises, an empty list is cached for ``negative_ttl`` seconds.
+        """
+        papers, state = self.lookup(key)
+        if state == FRESH:
+            return papers
+        if state == STALE:
+            self._refresh_in_background(key, fetch)
+            return papers
+        return self._fetch(key, fetch)
+
+    async def get_or_fetch_async(self, key: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """get_or_fetch for a coroutine ``fetch``; a stale entry is refreshed in a task on the running loop."""
+        # lookup may touch SQLite (expired entries, last-use flushes): keep it off the event loop.
+        papers, state = await asyncio.get_running_loop().run_in_executor(None, self.lookup, key)
+        if state == FRESH:
+            return papers
+        if state == STALE:
+            with self._lock:
+                if key in self._refreshing:
+                    return papers
+                self._refreshing.add(key)
+            # The loop only keeps weak references to tasks; hold this one until it is done.
+            task = asyncio.ensure_future(self._fetch_async(key, fetch))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._refreshed(key, done))
+            return papers
+        return await self._fetch_async(key, fetch)
+
+    def _fetch(self, key: str, fetch: Callable[[], List[Dict]]) -> List[Dict]:
+        try:
+            papers = fetch()
+        except Exception:
+            papers = []
+        return self._store(key, papers)
+
+    async def _fetch_async(self, key: str, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        try:
+            papers = await fetch()
+        except Exception:
+            papers = []
+        # The SQLite write stays off the event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, self._store, key, papers)
+
+    def _store(self, key: str, papers: List[Dict]) -> List[Dict]:
+        """Cache the result of a fetch and return what callers should get."""
+        if papers:
+            self.set(key, papers)
+            return papers
+        with self._lock:
+            stale = self._entries.get(key)
+            if stale is not None and stale.papers:
+                # Keep serving the old papers rather than replacing them with
+                # nothing, and hold off the next refresh attempt for a while.
+                stale.expires_at = time.time() + self.negative_ttl
+                if self._conn is not None:
+                    self._conn.execute("UPDATE papers SET expires_at = ? WHERE key = ?", (stale.expires_at, key))
+                    self._conn.commit()
+                return stale.papers
+        self.set(key, [])
+        return []
+
+    def _refreshed(self, key: str, task: "asyncio.Task"):
+        with self._lock:
+            self._refreshing.discard(key)
+            self._tasks.discard(task)
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], List[Dict]]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch(key, fetch)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def iter_papers(self):
+        """Yield every cached paper (fresh or stale), e.g. to seed another index."""
+        with self._lock:
+            lists = [entry.papers for entry in self._entries.values()]
+        for papers in lists:
+            yield from papers
+
+    def iter_entries(self):
+        """Yield ``(key, papers, expires_at)`` for every non-empty entry that can still be served."""
+        cutoff = time.time() - self.stale_ttl
+        with self._lock:
+            entries = [(key, entry.papers, entry.expires_at) for key, entry in self._entries.items()
+                       if entry.papers and entry.expires_at > cutoff]
+        yield from entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class PaperSets:
+    """
+    Paper lists recently sent to clients, by content-derived id.
+
+    Backs the cacheable ``/papers/<id>`` endpoint: responses name their paper
+    set and clients that already hold it are sent only paper ids.
+
+    Args:
+        max_sets: Lists kept (least recently used dropped)
+    """
+
+    def __init__(self, max_sets: int = 1000):
+        self.max_sets = max_sets
+        self._sets: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, set_id: str, papers: List[Dict]):
+        with self._lock:
+            self._sets[set_id] = papers
+            self._sets.move_to_end(set_id)
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+
+    def get(self, set_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            papers = self._sets.get(set_id)
+            if papers is not None:
+                self._sets.move_to_end(set_id)
+            return papers
+
+    def __contains__(self, set_id: str) -> bool:
+        with self._lock:
+            return set_id in self._sets
+
+    def __len__(self) -> int:
+        return len(self._sets)
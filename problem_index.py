@@ -0,0 +1,166 @@
+"""
+Semantic lookup of previously fetched problems.
+
+The paper cache is keyed by an exact hash of the problem text, so two
+wordings of the same question ("bee decline and food security" and "Impact
+of bee population decline on food security") each cost a Semantic Scholar
+call. This index keeps the embedding of every problem whose papers were
+fetched; a new problem whose nearest neighbour is at least ``threshold``
+similar reuses that problem's paper-cache key instead. Vectors are unit
+float32 rows in one matrix, persisted to SQLite next to the paper cache.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class ProblemIndex:
+    """
+    Problem embeddings keyed by paper-cache key.
+
+    Args:
+        path: SQLite file used for persistence (None keeps the index in memory only)
+        dim: Embedding dimension
+        model_name: Model that produced the vectors; rows from other models are ignored
+        threshold: Minimum cosine for a cached problem to be reused
+        max_entries: Problems kept (least recently matched dropped)
+    """
+
+    def __init__(self, path: Optional[str], dim: int, model_name: str, threshold: float = 0.85,
+                 max_entries: int = 1000):
+        self.dim = dim
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._keys: "OrderedDict[str, int]" = OrderedDict()  # key -> row in _vectors
+        self._problems: Dict[str, str] = {}
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._path = path
+        self._db = None
+        self._db_pid = None
+        if path:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS problems ("
+                " key TEXT PRIMARY KEY, problem TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+            self._load()
+
+    @property
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        """SQLite connection for this process (reopened after a fork), or None without persistence."""
+        if self._path is None:
+            return None
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT key, problem, vector FROM problems WHERE model = ? ORDER BY rowid DESC LIMIT ?",
+            (self.model_name, self.max_entries),
+        ).fetchall()
+        with self._lock:
+            for key, problem, blob in reversed(rows):
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if vector.shape == (self.dim,):
+                    self._insert(key, problem, vector)
+
+    def _insert(self, key: str, problem: str, vector: np.ndarray):
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return
+        if not self._free:
+            self._remove(next(iter(self._keys)))
+        row = self._free.pop()
+        self._vectors[row] = vector
+        self._keys[key] = row
+        self._problems[key] = problem
+
+    def _remove(self, key: str):
+        row = self._keys.pop(key)
+        self._problems.pop(key, None)
+        self._vectors[row] = 0
+        self._free.append(row)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM problems WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def add(self, key: str, problem: str, vector: np.ndarray):
+        """Remember that ``problem`` (embedded as ``vector``) has papers cached under ``key``."""
+        self.add_many([(key, problem, vector)])
+
+    def add_many(self, items: Iterable[Tuple[str, str, np.ndarray]]):
+        """``add`` for several ``(key, problem, vector)`` items, in one transaction."""
+        items = [(key, problem, np.asarray(vector, dtype=np.float32)) for key, problem, vector in items]
+        with self._lock:
+            for key, problem, vector in items:
+                self._insert(key, problem, vector)
+            if self._conn is not None and items:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO problems (key, problem, model, vector) VALUES (?, ?, ?, ?)",
+                    [(key, problem, self.model_name, vector.tobytes()) for key, problem, vector in items],
+                )
+                self._conn.commit()
+
+    def nearest(self, vector: np.ndarray,
+                is_live: Callable[[str], bool] = lambda key: True) -> Tuple[Optional[str], float]:
+        """
+        The key of the most similar cached problem, if it reaches ``threshold``.
+
+        ``is_live(key)`` tells whether the key still has papers cached; keys
+        that do not are dropped. Returns ``(key, similarity)``, with ``key``
+        None on a miss.
+        """
+        with self._lock:
+            while self._keys:
+                sims = self._vectors @ np.asarray(vector, dtype=np.float32)
+                rows = np.fromiter(self._keys.values(), dtype=np.int64, count=len(self._keys))
+                keys = list(self._keys)
+                best = int(np.argmax(sims[rows]))
+                similarity = float(sims[rows[best]])
+                if similarity < self.threshold:
+                    break
+                key = keys[best]
+                if not is_live(key):
+                    self._remove(key)
+                    continue
+                self._keys.move_to_end(key)
+                self.hits += 1
+                return key, similarity
+            self.misses += 1
+            return None, 0.0
+
+    def problem(self, key: str) -> Optional[str]:
+        return self._problems.get(key)
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._keys.get(key)
+            return None if row is None else self._vectors[row].copy()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._keys),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,81 @@
+"""
+Reduced-precision storage for unit-length embeddings.
+
+Three precisions are supported:
+
+    float32   the model output, unchanged
+    float16   half the memory, about 1e-3 relative error per component
+    int8      a quarter of the memory; each row is stored as int8 codes
+              plus one float32 scale
+
+Every row is represented as ``(codes, scale)`` with ``codes * scale`` being
+the (approximate) vector. For int8 the scale is ``1 / ||codes||``, so the
+decoded row has exactly unit length and a cosine against a float32 query is
+``(codes @ query) * scale`` -- computed on the codes, without decoding the
+stored matrix first.
+"""
+from typing import Tuple
+
+import numpy as np
+
+PRECISIONS = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+
+def check_precision(precision: str) -> str:
+    precision = (precision or "float32").lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown embedding precision {precision!r}; expected one of {', '.join(PRECISIONS)}")
+    return precision
+
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert float vectors to ``precision``.
+
+    Args:
+        vectors: Matrix with one vector per row (or a single vector)
+        precision: One of PRECISIONS
+
+    Returns:
+        ``(codes, scales)``: codes in the storage dtype with the input's shape,
+        and one float32 scale per row (all ones for float32 and float16)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    single = vectors.ndim == 1
+    rows = vectors.reshape(1, -1) if single else vectors
+    if precision == "int8":
+        peak = np.max(np.abs(rows), axis=1, keepdims=True)
+        peak[peak == 0] = 1.0
+        codes = np.rint(rows * (127.0 / peak)).astype(np.int8)
+        norms = np.linalg.norm(codes.astype(np.float32), axis=1)
+        scales = np.where(norms > 0, 1.0 / np.maximum(norms, 1e-12), 0.0).astype(np.float32)
+    else:
+        codes = rows.astype(PRECISIONS[precision])
+        scales = np.ones(len(rows), dtype=np.float32)
+    if single:
+        return codes[0], scales
+    return codes, scales
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Decode ``(codes, scales)`` back to float32 rows."""
+    codes = np.asarray(codes)
+    if codes.ndim == 1:
+        return codes.astype(np.float32) * np.float32(np.asarray(scales).reshape(-1)[0])
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def similarities(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot product of every stored row with a float32 ``query`` (cosine for unit vectors)."""
+    if not len(codes):
+        return np.zeros(0, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    if codes.dtype == np.float32:
+        dots = codes @ query
+    else:
+        dots = codes.astype(np.float32) @ query
+    return dots * np.asarray(scales, dtype=np.float32)
@@ -0,0 +1,89 @@
+"""
+Latest analysis revision per editor session.
+
+The live editor numbers its /score requests. When a user keeps typing,
+several revisions of one session can be in flight at once, and only the
+newest result is ever shown. Each request registers its revision here, and
+the scoring code calls ``check`` before each expensive stage (paper fetch,
+embedding, sentence analysis): a revision that a newer one has overtaken
+raises Superseded and the remaining work is skipped.
+Sessions are kept in LRU order, at most ``max_sessions`` of them.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+STAGES = ("queued", "papers", "embed", "analyze")
+
+
+class Superseded(Exception):
+    """A newer revision of the same session arrived; this one's work is dropped."""
+
+    def __init__(self, session_id: Hashable, revision: int, latest: int, stage: str):
+        super().__init__(f"revision {revision} of {session_id} superseded by {latest} before {stage}")
+        self.session_id = session_id
+        self.revision = revision
+        self.latest = latest
+        self.stage = stage
+
+
+class RevisionTracker:
+    """
+    Newest revision seen per session.
+
+    Args:
+        max_sessions: Sessions remembered (least recently active dropped)
+        on_superseded: Called with the stage name whenever work is dropped
+    """
+
+    def __init__(self, max_sessions: int = 1000, on_superseded=None):
+        self.max_sessions = max_sessions
+        self.on_superseded = on_superseded
+        self._latest: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.superseded = dict.fromkeys(STAGES, 0)
+
+    def begin(self, session_id: Hashable, revision: Optional[int]):
+        """Register ``revision`` for ``session_id``; raise Superseded if a newer one is already known."""
+        if revision is None:
+            return
+        with self._lock:
+            latest = self._latest.get(session_id)
+            if latest is None or revision >= latest:
+                self._latest[session_id] = revision
+                self._latest.move_to_end(session_id)
+                while len(self._latest) > self.max_sessions:
+                    self._latest.popitem(last=False)
+                self.started += 1
+                return
+        self._drop(session_id, revision, latest, "queued")
+
+    def check(self, session_id: Hashable, revision: Optional[int], stage: str):
+        """Raise Superseded if a newer revision of ``session_id`` arrived since ``revision`` began."""
+        if revision is None:
+            return
+        latest = self._latest.get(session_id)
+        if latest is not None and latest > revision:
+            self._drop(session_id, revision, latest, stage)
+
+    def latest(self, session_id: Hashable) -> Optional[int]:
+        return self._latest.get(session_id)
+
+    def _drop(self, session_id, revision, latest, stage):
+        with self._lock:
+            self.superseded[stage] += 1
+        if self.on_superseded is not None:
+            self.on_superseded(stage)
+        raise Superseded(session_id, revision, latest, stage)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._latest),
+                "started": self.started,
+                "superseded": dict(self.superseded),
+            }
+
+    def __len__(self) -> int:
+        return len(self._latest)
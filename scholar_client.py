@@ -0,0 +1,297 @@
+"""
+Pooled, rate-limited client for the Semantic Scholar paper search API.
+
+One ``requests.Session`` with a sized connection pool is shared by every
+request thread, so connections are kept alive between lookups. Identical
+concurrent searches are coalesced into a single HTTP call (single-flight),
+429 and 5xx responses are retried with jittered exponential backoff
+(honouring ``Retry-After``), and a token bucket keeps the process under the
+API quota.
+
+``AsyncSemanticScholarClient`` is the asyncio counterpart used by
+async_app.py: the same retries on an ``httpx.AsyncClient`` (imported only
+when it is created), sharing the token bucket with the threaded client and
+raising the same ``requests`` exception types.
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """No request token became available within the timeout."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate: Tokens added per second
+        burst: Maximum tokens held
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take one token if one is available (returns 0), else return the seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _wait(self, deadline: Optional[float]) -> Optional[float]:
+        """Seconds to sleep before retrying: 0 once a token was taken, None past the deadline."""
+        wait = self.try_acquire()
+        if not wait or deadline is None:
+            return wait
+        remaining = deadline - time.monotonic()
+        return min(wait, remaining) if remaining > 0 else None
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take one token, waiting up to ``timeout`` seconds; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._wait(deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """``acquire`` for coroutines: waits with ``asyncio.sleep`` instead of blocking the thread."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._wait(deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            await asyncio.sleep(wait)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop; concurrent awaiters of a key share one call."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        call = self._calls.get(key)
+        if call is not None:
+            self.shared += 1
+            # Shielded so a cancelled follower does not cancel the leader's call.
+            return await asyncio.shield(call)
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            call.exception()  # retrieved: no "never retrieved" warning without followers
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+def retry_delay(attempt: int, retry_after: str, backoff: float, max_backoff: float) -> float:
+    """Seconds before retry ``attempt``: the server's ``Retry-After`` if given, else jittered exponential backoff."""
+    if retry_after.isdigit():
+        return min(max_backoff, float(retry_after))
+    return random.uniform(0, min(max_backoff, backoff * (2 ** attempt)))
+
+
+class SemanticScholarClient:
+    """
+    Client for ``/paper/search``.
+
+    Args:
+        base_url: API root, e.g. ``https://api.semanticscholar.org/graph/v1``
+        api_key: Optional key sent as ``x-api-key``
+        timeout: Per-request timeout in seconds
+        max_retries: Retries after the first attempt for 429/5xx and connection errors
+        backoff: Base delay of the exponential backoff in seconds
+        max_backoff: Upper bound of a single backoff delay
+        rate: Requests per second allowed by the token bucket
+        burst: Token bucket size
+        pool_size: Keep-alive connections kept per host
+    """
+
+    def __init__(self, base_url: str = "https://api.semanticscholar.org/graph/v1",
+                 api_key: Optional[str] = None, timeout: float = 15, max_retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 8.0, rate: float = 1.0,
+                 burst: int = 3, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = TokenBucket(rate, burst)
+        self.flights = SingleFlight()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "Research-Companion-AI/1.0"
+        if api_key:
+            self.session.headers["x-api-key"] = api_key
+
+    def search(self, query: str, limit: int = 10,
+               fields: str = "title,abstract,authors,year,citationCount") -> Dict:
+        """Return the decoded search response; identical concurrent searches share one call."""
+        params = {"query": query, "limit": limit, "fields": fields}
+        return self.flights.do(("search", query, limit, fields), lambda: self._get("/paper/search", params))
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        return retry_delay(attempt, retry_after, self.backoff, self.max_backoff)
+
+    def _get(self, path: str, params: Dict) -> Dict:
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            if not self.limiter.acquire(timeout=self.timeout):
+                raise RateLimited(f"No request token for {url} within {self.timeout}s")
+            response = None
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+            time.sleep(self._delay(attempt, response))
+        raise AssertionError("unreachable")
+
+
+class AsyncSemanticScholarClient:
+    """
+    Non-blocking client for ``/paper/search`` on an ``httpx.AsyncClient``.
+
+    Takes the same arguments as SemanticScholarClient, plus ``limiter`` to
+    share a TokenBucket with it (one API quota per process). Must be created
+    and used on one event loop; call ``aclose()`` when done.
+    """
+
+    def __init__(self, base_url: str = "https://api.semanticscholar.org/graph/v1",
+                 api_key: Optional[str] = None, timeout: float = 15, max_retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 8.0, rate: float = 1.0,
+                 burst: int = 3, pool_size: int = 10, limiter: Optional[TokenBucket] = None):
+        import httpx
+
+        self._httpx = httpx
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = limiter or TokenBucket(rate, burst)
+        self.flights = AsyncSingleFlight()
+        headers = {"User-Agent": "Research-Companion-AI/1.0"}
+        if api_key:
+            headers["x-api-key"] = api_key
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def search(self, query: str, limit: int = 10,
+                     fields: str = "title,abstract,authors,year,citationCount") -> Dict:
+        """Return the decoded search response; identical concurrent searches share one call."""
+        params = {"query": query, "limit": limit, "fields": fields}
+        return await self.flights.do(("search", query, limit, fields), lambda: self._get("/paper/search", params))
+
+    async def _get(self, path: str, params: Dict) -> Dict:
+        httpx = self._httpx
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            if not await self.limiter.acquire_async(timeout=self.timeout):
+                raise RateLimited(f"No request token for {url} within {self.timeout}s")
+            response = None
+            try:
+                response = await self.client.get(url, params=params)
+            except httpx.TimeoutException as e:
+                if attempt == self.max_retries:
+                    raise requests.exceptions.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    if response.is_error:
+                        raise requests.exceptions.HTTPError(
+                            f"{response.status_code} Error for url: {response.url}", response=response)
+                    return response.json()
+            retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+            await asyncio.sleep(retry_delay(attempt, retry_after, self.backoff, self.max_backoff))
+        raise AssertionError("unreachable")
+
+    async def aclose(self):
+        await self.client.aclose()
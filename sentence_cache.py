@@ -0,0 +1,104 @@
+"""
+Sentence-level caches for the live typing loop.
+
+While a user types, almost every sentence of the paragraph is unchanged
+between two /score calls. This module keeps, keyed by a hash of the sentence
+text, the sentence embedding and the per-sentence analysis, plus the sentence
+set each session sent last so responses can flag what changed, and each
+session's last full-tier score, which live-tier requests reuse. Embeddings
+are held in the configured precision (quantize.py) and decoded on lookup.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+from quantize import check_precision, dequantize, quantize
+
+
+def sentence_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class _LRU:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.items: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+
+class SentenceCache:
+    """
+    Bounded caches keyed by sentence hash.
+
+    Args:
+        max_sentences: Embeddings and analyses kept (least recently used evicted)
+        max_sessions: Sessions whose last sentence set is remembered
+        precision: Storage precision of the embeddings, ``float32``, ``float16`` or ``int8``
+    """
+
+    def __init__(self, max_sentences: int = 20000, max_sessions: int = 1000, precision: str = "float32"):
+        self.precision = check_precision(precision)
+        self._embeddings = _LRU(max_sentences)
+        self._analyses = _LRU(max_sentences)
+        self._sessions = _LRU(max_sessions)
+        self._full = _LRU(max_sessions)
+        self._lock = threading.Lock()
+
+    def get_embeddings(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            hits = [self._embeddings.get(sentence_key(t)) for t in texts]
+        if self.precision == "float32":
+            return [None if hit is None else hit[0] for hit in hits]
+        return [None if hit is None else dequantize(*hit) for hit in hits]
+
+    def put_embeddings(self, texts: List[str], vectors: np.ndarray):
+        if not len(texts):
+            return
+        codes, scales = quantize(vectors, self.precision)
+        with self._lock:
+            for text, code, scale in zip(texts, codes, scales[:, None]):
+                self._embeddings.put(sentence_key(text), (code, scale))
+
+    def get_analysis(self, text: str, problem_hash: str) -> Optional[List[Dict]]:
+        with self._lock:
+            return self._analyses.get((sentence_key(text), problem_hash))
+
+    def put_analysis(self, text: str, problem_hash: str, issues: List[Dict]):
+        with self._lock:
+            self._analyses.put((sentence_key(text), problem_hash), issues)
+
+    def changed(self, session_id: Hashable, sentences: List[str]) -> List[bool]:
+        """
+        Flag sentences the session did not send last time, then remember this set.
+        The first request of a session marks every sentence as changed.
+        """
+        keys = [sentence_key(s) for s in sentences]
+        with self._lock:
+            previous = self._sessions.get(session_id) or frozenset()
+            self._sessions.put(session_id, frozenset(keys))
+        return [k not in previous for k in keys]
+
+    def put_full(self, session_id: Hashable, problem_hash: str, result: Dict):
+        """Remember the session's latest full-tier result for ``problem_hash``."""
+        with self._lock:
+            self._full.put(session_id, (problem_hash, result))
+
+    def get_full(self, session_id: Hashable, problem_hash: str) -> Optional[Dict]:
+        """The session's latest full-tier result, if it was for the same problem."""
+        with self._lock:
+            hit = self._full.get(session_id)
+        return hit[1] if hit is not None and hit[0] == problem_hash else None
@@ -0,0 +1,117 @@
+"""
+Per-session paragraph history used as the novelty fallback.
+
+Each session keeps the embeddings of its submitted paragraphs in one float32
+matrix, written once at insert time, so novelty against the history is a
+single matrix-vector product. Sessions hold at most ``max_items`` paragraphs
+(oldest overwritten first) and the least recently used sessions are dropped
+beyond ``max_sessions``. Rows can be kept in float16 or int8 (quantize.py);
+similarities are then computed on the stored codes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+from quantize import PRECISIONS, check_precision, dequantize, quantize, similarities
+
+
+class _Session:
+    __slots__ = ("vectors", "scales", "texts", "added_at", "count", "next")
+
+    def __init__(self, dim: int, capacity: int, precision: str = "float32"):
+        self.vectors = np.zeros((min(capacity, 8), dim), dtype=PRECISIONS[precision])
+        self.scales = np.ones(min(capacity, 8), dtype=np.float32)
+        self.texts: List[Optional[str]] = []
+        self.added_at: List[float] = []
+        self.count = 0
+        self.next = 0
+
+    def add(self, text: str, codes: np.ndarray, scale: float, capacity: int):
+        if self.next >= len(self.vectors) and len(self.vectors) < capacity:
+            size = min(capacity, 2 * len(self.vectors))
+            grown = np.zeros((size, self.vectors.shape[1]), dtype=self.vectors.dtype)
+            grown[:self.count] = self.vectors[:self.count]
+            self.vectors = grown
+            scales = np.ones(size, dtype=np.float32)
+            scales[:self.count] = self.scales[:self.count]
+            self.scales = scales
+        self.vectors[self.next] = codes
+        self.scales[self.next] = scale
+        if self.next < len(self.texts):
+            self.texts[self.next] = text
+            self.added_at[self.next] = time.time()
+        else:
+            self.texts.append(text)
+            self.added_at.append(time.time())
+        self.count = min(self.count + 1, capacity)
+        self.next = (self.next + 1) % capacity
+
+    def order(self) -> List[int]:
+        """Row indices from oldest to newest."""
+        return [(self.next + i) % self.count for i in range(self.count)]
+
+
+class SessionHistory:
+    """
+    Paragraph embeddings grouped by session id.
+
+    Args:
+        max_items: Paragraphs kept per session
+        max_sessions: Sessions kept before the least recently used is dropped
+        precision: Storage precision of the embeddings, ``float32``, ``float16`` or ``int8``
+    """
+
+    def __init__(self, max_items: int = 200, max_sessions: int = 1000, precision: str = "float32"):
+        self.max_items = max_items
+        self.precision = check_precision(precision)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Hashable, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session_id: Hashable, text: str, vector: np.ndarray):
+        codes, scales = quantize(vector, self.precision)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(len(vector), self.max_items, self.precision)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            session.add(text, codes, scales[0], self.max_items)
+
+    def max_similarity(self, session_id: Hashable, vector: np.ndarray) -> Optional[float]:
+        """Highest cosine similarity between ``vector`` and the session's paragraphs, or None if empty."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.count == 0:
+                return None
+            self._sessions.move_to_end(session_id)
+            sims = similarities(session.vectors[:session.count], session.scales[:session.count], vector)
+            return float(np.max(sims))
+
+    def clear(self, session_id: Hashable) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def export(self, session_id: Hashable, include_embeddings: bool = False) -> List[Dict]:
+        """Return the session's paragraphs, oldest first."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            items = []
+            for i in session.order():
+                item = {"paragraph": session.texts[i], "added_at": session.added_at[i]}
+                if include_embeddings:
+                    item["embedding"] = dequantize(session.vectors[i], session.scales[i:i + 1]).tolist()
+                items.append(item)
+            return items
+
+    def __contains__(self, session_id: Hashable) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,242 @@
+"""
+Versioned snapshots of the paper cache, with paper and problem embeddings.
+
+A new replica starts with an empty paper cache, so the first user of every
+problem pays for a Semantic Scholar call and for embedding the papers. A
+snapshot carries both: build one offline for a list of problems (or export
+a running cache) and point ``SNAPSHOT_PATH`` at it, and app.py loads it at
+boot. The embedding blocks are memory-mapped, not read: papers keep views
+into the file, pages are faulted in on first use and shared by every
+process that maps the same file.
+
+File layout::
+
+    magic     8 bytes  b"RCSNAP\\0\\0"
+    version   4 bytes  little-endian uint32 (FORMAT_VERSION)
+    length    8 bytes  little-endian uint64, size of the header
+    header    JSON: model, dim, precision, created, problems, block offsets
+    blocks    64-byte aligned: chunk codes (rows x dim, in ``precision``),
+              chunk scales (rows, float32), problem vectors (n x dim, float32)
+
+Each problem in the header has its paper-cache key, its text (if known),
+when its papers expire, and its papers; each paper names its chunk rows
+as ``[start, count]``.
+
+Usage:
+    python snapshot.py build problems.txt -o papers.snap [--workers 8] [--limit 10]
+    python snapshot.py export -o papers.snap
+    python snapshot.py info papers.snap
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"RCSNAP\x00\x00"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sIQ")
+_ALIGN = 64
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read."""
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def write(path: str, entries: Iterable[Dict], model: str, dim: int, precision: str) -> Dict:
+    """
+    Write a snapshot atomically and return its header.
+
+    Args:
+        path: Output file
+        entries: Dicts with ``key``, ``problem`` (or None), ``expires_at``,
+            ``papers`` (with ``embedding`` and ``embedding_scale`` attached,
+            as paper_embeddings leaves them) and ``vector`` (the problem
+            embedding, or None)
+        model: Embedding model name
+        dim: Embedding dimension
+        precision: Storage precision of the paper codes
+    """
+    dtype = DTYPES[precision]
+    problems, codes, scales, vectors = [], [], [], []
+    rows = 0
+    for entry in entries:
+        papers = []
+        for paper in entry["papers"]:
+            block = np.atleast_2d(paper["embedding"]).astype(dtype, copy=False)
+            scale = np.broadcast_to(
+                np.reshape(np.asarray(paper.get("embedding_scale", 1.0), dtype=np.float32), -1), len(block))
+            codes.append(block)
+            scales.append(scale)
+            record = {k: v for k, v in paper.items() if k not in ("embedding", "embedding_scale")}
+            record["rows"] = [rows, len(block)]
+            rows += len(block)
+            papers.append(record)
+        vector_row = None
+        if entry.get("vector") is not None:
+            vector_row = len(vectors)
+            vectors.append(np.asarray(entry["vector"], dtype=np.float32))
+        problems.append({"key": entry["key"], "problem": entry.get("problem"),
+                         "expires_at": entry["expires_at"], "vector_row": vector_row, "papers": papers})
+
+    code_block = np.concatenate(codes) if codes else np.zeros((0, dim), dtype=dtype)
+    scale_block = np.concatenate(scales).astype(np.float32) if scales else np.zeros(0, dtype=np.float32)
+    vector_block = np.stack(vectors) if vectors else np.zeros((0, dim), dtype=np.float32)
+    blocks = [("codes", code_block), ("scales", scale_block), ("vectors", vector_block)]
+
+    header = {"version": FORMAT_VERSION, "model": model, "dim": dim, "precision": precision,
+              "created": time.time(), "rows": rows, "problems": problems, "blocks": {}}
+    # Offsets depend on the header length, which depends on the offsets: reserve
+    # room for them first, then pad the header to the aligned data start.
+    offset = 0
+    for name, array in blocks:
+        header["blocks"][name] = {"offset": offset, "shape": list(array.shape)}
+        offset = _aligned(offset + array.nbytes)
+    data = json.dumps(header).encode("utf-8")
+    start = _aligned(_PREFIX.size + len(data) + 16)
+    data = data + b" " * (start - _PREFIX.size - len(data))
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(data)))
+        f.write(data)
+        for name, array in blocks:
+            f.seek(start + header["blocks"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+    return header
+
+
+class Snapshot:
+    """A snapshot file opened with its embedding blocks memory-mapped (read-only)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise SnapshotError(f"{path}: too short to be a snapshot")
+            magic, version, length = _PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                raise SnapshotError(f"{path}: not a snapshot file")
+            if version != FORMAT_VERSION:
+                raise SnapshotError(f"{path}: snapshot format {version}, this version reads {FORMAT_VERSION}")
+            self.header = json.loads(f.read(length))
+        start = _PREFIX.size + length
+        self.model = self.header["model"]
+        self.dim = self.header["dim"]
+        self.precision = self.header["precision"]
+        self.created = self.header["created"]
+        self.problems: List[Dict] = self.header["problems"]
+        self.codes = self._map(start, "codes", DTYPES[self.precision])
+        self.scales = self._map(start, "scales", np.float32)
+        self.vectors = self._map(start, "vectors", np.float32)
+
+    def _map(self, start: int, name: str, dtype) -> np.ndarray:
+        block = self.header["blocks"][name]
+        shape = tuple(block["shape"])
+        if not np.prod(shape):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=start + block["offset"], shape=shape)
+
+    def papers(self, entry: Dict) -> List[Dict]:
+        """The papers of a problem entry with views of their chunk rows attached."""
+        papers = []
+        for record in entry["papers"]:
+            paper = {k: v for k, v in record.items() if k != "rows"}
+            first, count = record["rows"]
+            paper["embedding_scale"] = self.scales[first:first + count]
+            paper["embedding"] = self.codes[first:first + count]
+            papers.append(paper)
+        return papers
+
+    def vector(self, entry: Dict) -> Optional[np.ndarray]:
+        row = entry.get("vector_row")
+        return None if row is None else self.vectors[row]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.problems)
+
+    def __len__(self) -> int:
+        return len(self.problems)
+
+    def summary(self) -> Dict:
+        return {
+            "path": self.path,
+            "version": FORMAT_VERSION,
+            "model": self.model,
+            "dim": self.dim,
+            "precision": self.precision,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created)),
+            "problems": len(self.problems),
+            "papers": sum(len(p["papers"]) for p in self.problems),
+            "chunk_rows": self.header["rows"],
+            "bytes": os.path.getsize(self.path),
+        }
+
+
+def build(problems: List[str], limit: int = 10, workers: int = 8) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Fetch and embed ``problems`` in parallel through app.py; returns ``(key, problem)`` pairs and failures."""
+    import app
+
+    def run(problem):
+        papers = app.fetch_research_papers(problem, limit)
+        return problem, papers
+
+    done, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for problem, papers in pool.map(run, problems):
+            if papers:
+                done.append((app.paper_cache_key(problem)[0], problem))
+            else:
+                failed.append(problem)
+            print(f"{len(papers):3d} papers  {problem[:70]}", file=sys.stderr, flush=True)
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, export and inspect paper-cache snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="Fetch and embed a list of problems into a snapshot")
+    p.add_argument("problems", help="Text file with one research problem per line ('-' for stdin)")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--workers", type=int, default=8, help="Problems fetched in parallel")
+    p.add_argument("--limit", type=int, default=10, help="Papers per problem")
+    p = sub.add_parser("export", help="Write the paper cache under CACHE_DIR to a snapshot")
+    p.add_argument("-o", "--output", required=True)
+    p = sub.add_parser("info", help="Describe a snapshot")
+    p.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(Snapshot(args.path).summary(), indent=2))
+        return
+
+    import app
+
+    if args.command == "build":
+        stream = sys.stdin if args.problems == "-" else open(args.problems, encoding="utf-8")
+        with stream:
+            problems = list(dict.fromkeys(line.strip() for line in stream if line.strip()))
+        done, failed = build(problems, args.limit, args.workers)
+        header = app.export_snapshot(args.output, dict(done))
+        if failed:
+            print(f"No papers for {len(failed)} problems", file=sys.stderr)
+    else:
+        header = app.export_snapshot(args.output)
+    print(f"Wrote {len(header['problems'])} problems, {header['rows']} chunk rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
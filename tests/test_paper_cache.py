@@ -0,0 +1,117 @@
+"""
+PaperCache: TTLs, stale-while-revalidate, LRU bounds and SQLite persistence.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from paper_cache import FRESH, STALE, PaperCache
+
+
+def papers(name, n=1):
+    return [{"title": f"{name} {i}", "abstract": "x" * 50} for i in range(n)]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_entries_are_fresh_then_stale_then_gone():
+    cache = PaperCache(ttl=0.1, stale_ttl=0.1)
+    cache.set("k", papers("a"))
+    assert cache.lookup("k")[1] == FRESH
+    time.sleep(0.12)
+    assert cache.lookup("k")[1] == STALE
+    time.sleep(0.12)
+    assert cache.lookup("k") == (None, None)
+    assert len(cache) == 0
+
+
+def test_stale_entry_is_served_while_refreshed_in_background():
+    cache = PaperCache(ttl=0.05)
+    cache.set("k", papers("old"))
+    time.sleep(0.06)
+    release, calls = threading.Event(), []
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return papers("new")
+
+    # Both lookups get the old papers at once; only one refresh runs.
+    assert cache.get_or_fetch("k", fetch) == papers("old")
+    assert cache.get_or_fetch("k", fetch) == papers("old")
+    release.set()
+    wait_for(lambda: cache.lookup("k") == (papers("new"), FRESH))
+    assert len(calls) == 1
+
+
+def test_failed_refresh_keeps_stale_papers():
+    cache = PaperCache(ttl=0.05, negative_ttl=60)
+    cache.set("k", papers("old"))
+    time.sleep(0.06)
+
+    def fetch():
+        raise OSError("search failed")
+
+    cache.get_or_fetch("k", fetch)
+    wait_for(lambda: cache.lookup("k")[1] == FRESH)
+    assert cache.lookup("k")[0] == papers("old")
+
+
+def test_failed_miss_is_cached_for_negative_ttl():
+    cache = PaperCache(negative_ttl=0.1)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise OSError("search failed")
+
+    assert cache.get_or_fetch("k", fetch) == []
+    assert cache.get_or_fetch("k", fetch) == []
+    assert len(calls) == 1
+    time.sleep(0.12)
+    cache.get_or_fetch("k", fetch)
+    assert len(calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PaperCache(max_entries=2)
+    cache.set("a", papers("a"))
+    cache.set("b", papers("b"))
+    cache.lookup("a")
+    cache.set("c", papers("c"))
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+
+def test_byte_bound_counts_attached_vectors():
+    vector = np.zeros((4, 384), dtype=np.float32)
+    cache = PaperCache(max_bytes=vector.nbytes + 150)
+    second = papers("b")
+    cache.set("a", papers("a"))
+    cache.set("b", second)
+    assert len(cache) == 2
+    # Attaching vectors to "b" pushes the total over the bound: the older "a" goes.
+    second[0]["embedding"] = vector
+    cache.account("b")
+    assert "a" not in cache and "b" in cache
+    assert cache.size_bytes == vector.nbytes + len('[{"title": "b 0", "abstract": "' + "x" * 50 + '"}]')
+
+
+def test_restart_loads_in_recency_order(tmp_path):
+    path = os.path.join(tmp_path, "papers.sqlite")
+    cache = PaperCache(path, flush_interval=3600)
+    cache.set("a", papers("a"))
+    time.sleep(0.01)
+    cache.set("b", papers("b"))
+    time.sleep(0.01)
+    cache.lookup("a")
+    cache.flush()
+    restarted = PaperCache(path, max_entries=1)
+    assert list(restarted.iter_papers()) == papers("a")
@@ -0,0 +1,45 @@
+"""
+quantize.py: decoded rows stay unit length and cosines stay close to float32.
+"""
+import numpy as np
+import pytest
+
+from quantize import PRECISIONS, check_precision, dequantize, quantize, similarities
+
+
+def unit_rows(n=200, dim=384, seed=0):
+    rows = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("precision", list(PRECISIONS))
+def test_round_trip_stays_unit_length(precision):
+    codes, scales = quantize(unit_rows(), precision)
+    assert codes.dtype == PRECISIONS[precision]
+    assert scales.shape == (200,)
+    norms = np.linalg.norm(dequantize(codes, scales), axis=1)
+    assert np.allclose(norms, 1.0, atol=1e-3)
+
+
+@pytest.mark.parametrize("precision,tolerance", [("float32", 1e-6), ("float16", 2e-3), ("int8", 2e-2)])
+def test_similarities_match_float32(precision, tolerance):
+    rows, query = unit_rows(), unit_rows(1, seed=1)[0]
+    codes, scales = quantize(rows, precision)
+    assert np.max(np.abs(similarities(codes, scales, query) - rows @ query)) < tolerance
+
+
+def test_single_vector_and_zero_row():
+    vector = unit_rows(1)[0]
+    codes, scales = quantize(vector, "int8")
+    assert codes.shape == vector.shape and scales.shape == (1,)
+    assert np.isclose(np.linalg.norm(dequantize(codes, scales)), 1.0, atol=1e-3)
+    codes, scales = quantize(np.zeros((1, 8)), "int8")
+    assert not codes.any() and scales[0] == 0
+    assert similarities(codes[:0], scales[:0], np.ones(8)).shape == (0,)
+
+
+def test_check_precision():
+    assert check_precision("INT8") == "int8"
+    assert check_precision(None) == "float32"
+    with pytest.raises(ValueError):
+        check_precision("int4")
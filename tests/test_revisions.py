@@ -0,0 +1,68 @@
+"""
+RevisionTracker: newer revisions supersede older ones, at whichever stage they are.
+"""
+import pytest
+
+from revisions import RevisionTracker, Superseded
+
+
+def test_newer_revision_supersedes_work_in_progress():
+    tracker = RevisionTracker()
+    tracker.begin("s", 1)
+    tracker.check("s", 1, "papers")
+    tracker.begin("s", 2)
+    with pytest.raises(Superseded) as info:
+        tracker.check("s", 1, "embed")
+    assert (info.value.session_id, info.value.revision, info.value.latest, info.value.stage) == ("s", 1, 2, "embed")
+    tracker.check("s", 2, "embed")
+    assert tracker.latest("s") == 2
+
+
+def test_revision_arriving_after_a_newer_one_is_dropped_when_queued():
+    tracker = RevisionTracker()
+    tracker.begin("s", 3)
+    with pytest.raises(Superseded) as info:
+        tracker.begin("s", 2)
+    assert info.value.stage == "queued"
+    assert tracker.latest("s") == 3
+    # Resending the current revision is not a conflict.
+    tracker.begin("s", 3)
+
+
+def test_sessions_and_missing_revisions_are_independent():
+    tracker = RevisionTracker()
+    tracker.begin("a", 5)
+    tracker.begin("b", 1)
+    tracker.check("b", 1, "analyze")
+    tracker.begin("a", None)
+    tracker.check("a", None, "analyze")
+    assert tracker.latest("a") == 5
+
+
+def test_stats_and_callback_count_drops_per_stage():
+    stages = []
+    tracker = RevisionTracker(on_superseded=stages.append)
+    tracker.begin("s", 1)
+    tracker.begin("s", 2)
+    for stage in ("papers", "analyze"):
+        with pytest.raises(Superseded):
+            tracker.check("s", 1, stage)
+    with pytest.raises(Superseded):
+        tracker.begin("s", 1)
+    assert stages == ["papers", "analyze", "queued"]
+    stats = tracker.stats()
+    assert stats["sessions"] == 1 and stats["started"] == 2
+    assert stats["superseded"] == {"queued": 1, "papers": 1, "embed": 0, "analyze": 1}
+
+
+def test_least_recently_active_session_is_forgotten():
+    tracker = RevisionTracker(max_sessions=2)
+    tracker.begin("a", 1)
+    tracker.begin("b", 1)
+    tracker.begin("a", 2)
+    tracker.begin("c", 1)
+    assert len(tracker) == 2
+    assert tracker.latest("b") is None
+    # A forgotten session starts over: an old revision is accepted again.
+    tracker.begin("b", 0)
+    assert tracker.latest("b") == 0
@@ -0,0 +1,118 @@
+"""
+SemanticScholarClient against the local stub of benchmarks/stub_scholar.py.
+"""
+import threading
+import time
+
+import pytest
+import requests
+
+import stub_scholar
+from paper_cache import PaperCache
+from scholar_client import SemanticScholarClient, TokenBucket
+
+
+@pytest.fixture
+def stub():
+    """Start a stub with the given options; every stub started is shut down afterwards."""
+    servers = []
+
+    def start(**options):
+        server, url = stub_scholar.start(**options)
+        servers.append(server)
+        return server.state, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client_for(url, **settings):
+    settings = {"rate": 1000.0, "burst": 1000, "backoff": 0.01, "max_backoff": 2.0, "timeout": 5, **settings}
+    return SemanticScholarClient(base_url=url, **settings)
+
+
+def test_concurrent_identical_searches_make_one_request(stub):
+    state, url = stub(latency_ms=300)
+    client = client_for(url)
+    results, start = [], threading.Barrier(10)
+
+    def search():
+        start.wait()
+        results.append(client.search("bee decline", 5))
+
+    threads = [threading.Thread(target=search) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state.requests == 1
+    assert client.flights.shared == 9
+    assert len(results) == 10 and all(r == results[0] for r in results)
+    assert len(results[0]["data"]) == 5
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retryable_statuses_are_retried(stub, status):
+    state, url = stub(error_status=status, fail_first=2)
+    result = client_for(url, max_retries=3).search("pollinator loss")
+    assert state.requests == 3
+    assert state.errors == 2
+    assert result["data"]
+
+
+def test_retry_after_is_honoured(stub):
+    state, url = stub(error_status=503, retry_after="1", fail_first=1)
+    start = time.monotonic()
+    client_for(url, backoff=0.0).search("pollinator loss")
+    assert state.requests == 2
+    assert time.monotonic() - start >= 0.95
+
+
+def test_retries_give_up_after_max_retries(stub):
+    state, url = stub(error_status=503, error_rate=1.0)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client_for(url, max_retries=2).search("pollinator loss")
+    assert state.requests == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    state, url = stub(error_status=400, fail_first=1)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client_for(url, max_retries=3).search("pollinator loss")
+    assert state.requests == 1
+
+
+def test_token_bucket_caps_request_rate(stub):
+    state, url = stub()
+    client = client_for(url, rate=20.0, burst=2)
+    start = time.monotonic()
+    for i in range(12):
+        client.search(f"query {i}")
+    elapsed = time.monotonic() - start
+    # Two requests ride the burst, the other ten wait for tokens at 20 per second.
+    assert state.requests == 12
+    assert elapsed >= 10 / 20 * 0.9
+
+
+def test_token_bucket_times_out():
+    bucket = TokenBucket(rate=1.0, burst=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.05)
+    assert 0 < bucket.try_acquire() <= 1.0
+
+
+def test_failed_fetch_is_negatively_cached(stub):
+    state, url = stub(error_status=503, error_rate=1.0)
+    client = client_for(url, max_retries=1)
+    cache = PaperCache(negative_ttl=60)
+
+    def fetch():
+        return client.search("pollinator loss")["data"]
+
+    for _ in range(5):
+        assert cache.get_or_fetch("pollinator loss", fetch) == []
+    # One failed fetch (the first attempt plus one retry); later lookups are served from the cache.
+    assert state.requests == 2
@@ -0,0 +1,68 @@
+"""
+segmenter.py: sentence boundaries and offsets in academic prose, and the SegmentCache bound.
+"""
+import pytest
+
+from segmenter import SegmentCache, spans, split
+
+
+@pytest.mark.parametrize("text, sentences", [
+    ("We use the data of Doe et al. (2019). It covers 40 sites.",
+     ["We use the data of Doe et al. (2019).", "It covers 40 sites."]),
+    ("See Fig. 2 and Eq. 4 for the model. Results follow.",
+     ["See Fig. 2 and Eq. 4 for the model.", "Results follow."]),
+    ("Pesticides, e.g. neonicotinoids, were applied. In the U.S. Midwest too.",
+     ["Pesticides, e.g. neonicotinoids, were applied.", "In the U.S. Midwest too."]),
+    ("J. Doe collected samples. Is loss the driver? Yes!",
+     ["J. Doe collected samples.", "Is loss the driver?", "Yes!"]),
+    ("Yields fell by 3.5% per year [3]. The trend held.", ["Yields fell by 3.5% per year [3].", "The trend held."]),
+    ("i.e. the first case. the second case follows.", ["i.e. the first case. the second case follows."]),
+])
+def test_split_academic_sentences(text, sentences):
+    assert split(text) == sentences
+
+
+def test_blank_line_ends_a_sentence_without_punctuation():
+    assert split("Introduction\n\nBees pollinate crops.") == ["Introduction", "Bees pollinate crops."]
+
+
+def test_offsets_point_at_the_sentences_in_the_input():
+    text = "  First one (n = 12).  \"Second,\" he said.\n\n  Third without a period  "
+    result = spans(text)
+    assert [text[a:b] for a, b in result] == ["First one (n = 12).", "\"Second,\" he said.", "Third without a period"]
+    assert result[0][0] == 2
+    assert split(text) == [text[a:b] for a, b in result]
+
+
+def test_empty_and_whitespace_text_have_no_sentences():
+    assert spans("") == []
+    assert spans(" \n\n ") == []
+
+
+def test_cache_serves_repeats_and_counts_hits():
+    cache, calls = SegmentCache(), []
+
+    def segment(text):
+        calls.append(text)
+        return tuple(split(text))
+
+    assert cache.get("One. Two.", segment) == ("One.", "Two.")
+    assert cache.get("One. Two.", segment) == ("One.", "Two.")
+    assert calls == ["One. Two."]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_is_bounded_by_characters():
+    cache = SegmentCache(max_chars=25, max_text_chars=25)
+    for text in ("a" * 10, "b" * 10):
+        cache.get(text, tuple)
+    cache.get("a" * 10, tuple)
+    cache.get("c" * 10, tuple)
+    assert len(cache) == 2 and cache.chars == 20
+    assert cache.get("b" * 10, lambda text: "miss") == "miss"
+
+
+def test_long_texts_are_not_cached():
+    cache = SegmentCache(max_chars=1000, max_text_chars=50)
+    cache.get("x" * 51, tuple)
+    assert len(cache) == 0 and cache.chars == 0